@@ -0,0 +1,817 @@
+import argparse
+import bz2
+import csv
+import glob
+import gzip
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime
+
+# The converter script name contains spaces, so load it from its path
+CONVERTER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import supp_evidence5 json.py')
+
+def load_converter():
+    """Load the converter script as a module"""
+    spec = importlib.util.spec_from_file_location('supp_evidence5_json', CONVERTER_PATH)
+    module = importlib.util.module_from_spec(spec)
+
+    # Registered so the converter's process pools can pickle its functions by name
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+def bundled_inputs():
+    """Return the measure files shipped next to the converter"""
+    return sorted(glob.glob(os.path.join(os.path.dirname(CONVERTER_PATH), '*_supporting_evidence.ndjson')))
+
+def benchmark_decoders(converter, input_files, repeat=3):
+    """Report decode-only and end-to-end MB/s for every available JSON decoder"""
+    print(f"{'file':40} {'decoder':8} {'size MB':>8} {'decode MB/s':>12} {'convert MB/s':>13}")
+
+    for input_file in input_files:
+        size_mb = os.path.getsize(input_file) / (1024 * 1024)
+
+        for decoder in ['json', 'bytes', 'orjson']:
+            if decoder not in converter.JSON_DECODERS:
+                print(f"{os.path.basename(input_file):40} {decoder:8} {'not installed':>8}")
+                continue
+
+            reads_bytes, loads = converter.JSON_DECODERS[decoder]
+            if reads_bytes:
+                lines = list(converter.read_byte_range(input_file, 0, os.path.getsize(input_file)))
+            else:
+                with open(input_file, 'r', encoding='utf-8-sig') as f:
+                    lines = f.readlines()
+
+            # Decoding only, with the lines already in memory
+            decode_time = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for line in lines:
+                    if line.strip():
+                        loads(line)
+                decode_time = min(decode_time, time.perf_counter() - start)
+
+            # Reading, decoding and flattening the whole file
+            convert_time = float('inf')
+            for _ in range(repeat):
+                with tempfile.TemporaryDirectory() as output_dir:
+                    fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(input_file, output_dir, decoder=decoder)
+                    start = time.perf_counter()
+                    fhir.process_file()
+                    convert_time = min(convert_time, time.perf_counter() - start)
+
+            print(f"{os.path.basename(input_file):40} {decoder:8} {size_mb:8.2f} "
+                  f"{size_mb / decode_time:12.1f} {size_mb / convert_time:13.1f}")
+
+def benchmark_flatten(converter, input_files, repeat=3):
+    """Report flattening throughput per resource type, with the records already decoded"""
+    resources = {}
+    for input_file in input_files:
+        with open(input_file, 'r', encoding='utf-8-sig') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                for param in json.loads(line)['parameter']:
+                    if 'resource' in param:
+                        resources.setdefault(param['resource']['resourceType'], []).append(param['resource'])
+
+    print(f"{'resource type':24} {'count':>7} {'ms':>9} {'resources/s':>12} {'rows/s':>10}")
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for resource_type, items in sorted(resources.items()):
+            fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(input_files[0], output_dir)
+            extractor = fhir.extractors.get(resource_type)
+            if extractor is None:
+                print(f"{resource_type:24} {len(items):7} {'not mapped':>9}")
+                continue
+
+            best = float('inf')
+            for _ in range(repeat):
+                fhir.data = {table: [] for table in fhir.tables}
+                start = time.perf_counter()
+                for resource in items:
+                    extractor(resource, 'benchmark', fhir.data, fhir.counter)
+                best = min(best, time.perf_counter() - start)
+
+            rows = fhir.buffered_rows()
+            print(f"{resource_type:24} {len(items):7} {best * 1000:9.2f} {len(items) / best:12.0f} {rows / best:10.0f}")
+
+def benchmark_projection(converter, input_files, repeat=3, select=('patients', 'parameter_values')):
+    """Compare converting every table with converting only a selection of tables"""
+    print(f"{'file':40} {'decoder':8} {'all tables s':>13} {'selected s':>11} {'speedup':>8}")
+
+    for input_file in input_files:
+        for decoder in ['json', 'orjson']:
+            if decoder not in converter.JSON_DECODERS:
+                continue
+
+            timings = []
+            for selection in [None, list(select)]:
+                best = float('inf')
+                for _ in range(repeat):
+                    with tempfile.TemporaryDirectory() as output_dir:
+                        fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(input_file, output_dir, decoder=decoder, select=selection)
+                        start = time.perf_counter()
+                        fhir.process_file()
+                        best = min(best, time.perf_counter() - start)
+                timings.append(best)
+
+            print(f"{os.path.basename(input_file):40} {decoder:8} {timings[0]:13.3f} {timings[1]:11.3f} "
+                  f"{timings[0] / timings[1]:7.1f}x")
+
+def peak_rss_mb():
+    """Return the peak RSS of this process in MB"""
+    # Linux keeps ru_maxrss across the exec of a spawned worker, so it would include the
+    # parent's memory; VmHWM belongs to the worker's own address space
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def scaled_input(input_file, scale, output_dir):
+    """Return input_file, or a copy of it with its lines repeated scale times"""
+    if scale == 1:
+        return input_file
+    scaled_file = os.path.join(output_dir, os.path.basename(input_file))
+    with open(input_file, 'rb') as f:
+        data = f.read()
+    # Only the start of the file may carry a byte order mark
+    if not data.endswith(b'\n'):
+        data += b'\n'
+    with open(scaled_file, 'wb') as f:
+        f.write(data)
+        for _ in range(scale - 1):
+            f.write(data.removeprefix(b'\xef\xbb\xbf'))
+    return scaled_file
+
+def measure_peak_rss(input_file, layout):
+    """Hold every row of a file in memory in the given layout and return the peak RSS in MB (pool worker)"""
+    converter = load_converter()
+    with tempfile.TemporaryDirectory() as output_dir:
+        fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(input_file, output_dir)
+        fhir.process_file()
+        if layout == 'dict':
+            # Rebuild the per-row dicts keyed by column name, table by table
+            for table, rows in fhir.data.items():
+                fhir.data[table] = [dict(zip(fhir.tables[table], row)) for row in rows]
+    return peak_rss_mb()
+
+def measure_row_bytes(input_file):
+    """Return the row count and the bytes held by the tuple and dict row layouts (pool worker)"""
+    converter = load_converter()
+    with tempfile.TemporaryDirectory() as output_dir:
+        fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(input_file, output_dir)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        fhir.process_file()
+        tuple_bytes = tracemalloc.get_traced_memory()[0] - before
+
+        # Both layouts share the values, they differ in the row containers
+        tuple_containers = sum(sys.getsizeof(row) for rows in fhir.data.values() for row in rows)
+        before = tracemalloc.get_traced_memory()[0]
+        dicts = {table: [dict(zip(fhir.tables[table], row)) for row in rows] for table, rows in fhir.data.items()}
+        dict_bytes = tuple_bytes - tuple_containers + tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        return fhir.buffered_rows(), tuple_bytes, dict_bytes
+
+def benchmark_memory(converter, input_files, scale=1):
+    """Report peak RSS and bytes per row of the tuple rows against per-row dicts"""
+    print(f"{'file':40} {'rows':>9} {'tuple B/row':>12} {'dict B/row':>11} {'tuple RSS MB':>13} {'dict RSS MB':>12}")
+
+    # Every measurement runs in a fresh interpreter so peak RSS is not inherited
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as scratch:
+        for input_file in input_files:
+            measured_file = scaled_input(input_file, scale, scratch)
+            results = {}
+            for name, function, args in [('bytes', measure_row_bytes, ()), ('tuple', measure_peak_rss, ('tuple',)),
+                                         ('dict', measure_peak_rss, ('dict',))]:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    results[name] = pool.submit(function, measured_file, *args).result()
+
+            rows, tuple_bytes, dict_bytes = results['bytes']
+            print(f"{os.path.basename(input_file):40} {rows:9} {tuple_bytes / rows:12.0f} {dict_bytes / rows:11.0f} "
+                  f"{results['tuple']:13.1f} {results['dict']:12.1f}")
+
+def compress_input(input_file, compression, output_dir):
+    """Write a gzip, bz2 or zstd copy of input_file and return its path"""
+    extension = {'gzip': '.gz', 'bz2': '.bz2', 'zstd': '.zst'}[compression]
+    compressed_file = os.path.join(output_dir, os.path.basename(input_file) + extension)
+    with open(input_file, 'rb') as f:
+        data = f.read()
+    if compression == 'gzip':
+        data = gzip.compress(data)
+    elif compression == 'bz2':
+        data = bz2.compress(data)
+    else:
+        import zstandard
+        data = zstandard.ZstdCompressor().compress(data)
+    with open(compressed_file, 'wb') as f:
+        f.write(data)
+    return compressed_file
+
+def run_reader(input_file, reader, decompress_first, decoder):
+    """Convert a file with the given reader, optionally decompressing it to disk first (pool worker)"""
+    converter = load_converter()
+    with tempfile.TemporaryDirectory() as output_dir, redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if decompress_first:
+            plain_file = os.path.join(output_dir, 'input.ndjson')
+            with converter.open_compressed(input_file, converter.detect_input_format(input_file)) as stream, \
+                    open(plain_file, 'wb') as f:
+                shutil.copyfileobj(stream, f, converter.READ_BUFFER_SIZE)
+            input_file = plain_file
+        fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(input_file, output_dir, streaming=True, decoder=decoder,
+                                                           reader=reader)
+        fhir.process_file()
+        fhir.export_to_quoted_pipe_delimited_no_header()
+        seconds = time.perf_counter() - start
+    return seconds, peak_rss_mb()
+
+def benchmark_readers(converter, input_files, scale=1, decoder='json'):
+    """Compare the input readers, and compressed input against decompressing to disk before converting"""
+    print(f"{'file':40} {'reader':7} {'MB on disk':>10} {'direct s':>9} {'RSS MB':>7} {'decompress+convert s':>21} {'RSS MB':>7}")
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as scratch:
+        for input_file in input_files:
+            measured_file = scaled_input(input_file, scale, scratch)
+            for reader in ['file', 'mmap', 'gzip', 'bz2', 'zstd']:
+                if reader == 'zstd' and converter.zstandard is None:
+                    print(f"{os.path.basename(input_file):40} {reader:7} {'not installed':>10}")
+                    continue
+
+                compressed = reader not in ('file', 'mmap')
+                reader_file = compress_input(measured_file, reader, scratch) if compressed else measured_file
+                size_mb = os.path.getsize(reader_file) / (1024 * 1024)
+
+                # Every run gets a fresh interpreter so peak RSS is per run
+                timings = []
+                for decompress_first in ([False, True] if compressed else [False]):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        timings.append(pool.submit(
+                            run_reader, reader_file, 'auto' if decompress_first else reader, decompress_first, decoder
+                        ).result())
+                if compressed:
+                    os.remove(reader_file)
+
+                line = f"{os.path.basename(input_file):40} {reader:7} {size_mb:10.1f} {timings[0][0]:9.3f} {timings[0][1]:7.1f}"
+                if compressed:
+                    line += f" {timings[1][0]:21.3f} {timings[1][1]:7.1f}"
+                print(line)
+
+def benchmark_export(converter, input_files, repeat=3, scale=1):
+    """Compare exporting the flattened tables serially, on threads, compressed and split into parts"""
+    print(f"{'file':40} {'threads':>7} {'compression':11} {'part rows':>9} {'export s':>9} {'MB written':>10}")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        for input_file in input_files:
+            measured_file = scaled_input(input_file, scale, scratch)
+            for threads, compression, part_rows in [(1, None, None), (4, None, None), (4, None, 1000),
+                                                    (1, 'gzip', None), (4, 'gzip', None), (4, 'zstd', None)]:
+                if compression == 'zstd' and converter.zstandard is None:
+                    continue
+
+                best = float('inf')
+                for _ in range(repeat):
+                    with tempfile.TemporaryDirectory(dir=scratch) as output_dir:
+                        fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(
+                            measured_file, output_dir, export_threads=threads, compression=compression, part_rows=part_rows
+                        )
+                        fhir.process_file()
+                        with redirect_stdout(io.StringIO()):
+                            start = time.perf_counter()
+                            fhir.export_to_quoted_pipe_delimited_no_header()
+                            best = min(best, time.perf_counter() - start)
+                        size_mb = sum(entry.stat().st_size for entry in os.scandir(output_dir)) / (1024 * 1024)
+
+                print(f"{os.path.basename(input_file):40} {threads:7} {compression or 'none':11} {part_rows or '-':>9} "
+                      f"{best:9.3f} {size_mb:10.1f}")
+
+def run_pipeline(input_file, output_dir, options):
+    """Convert a file in a fresh process and return its run time (pipeline suite worker)"""
+    # Workers of the converter's pool inherit the module loaded from its path instead of importing it
+    multiprocessing.set_start_method('fork', force=True)
+    converter = load_converter()
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(input_file, output_dir, streaming=True, **options)
+        fhir.process_file()
+        fhir.export_to_quoted_pipe_delimited_no_header()
+    return time.perf_counter() - start
+
+def benchmark_pipeline(converter, input_files, repeat=3, scale=1, decoder='json'):
+    """Compare the sequential conversion with the pipeline mode, with and without flattening workers"""
+    print(f"{'file':40} {'mode':22} {'seconds':>8} {'MB/s':>7}")
+
+    workers = max(2, os.cpu_count() or 1)
+    modes = [
+        ('sequential', {}),
+        ('pipeline', {'pipeline': True}),
+        (f"pipeline, {workers} workers", {'pipeline': True, 'workers': workers}),
+    ]
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as scratch:
+        for input_file in input_files:
+            measured_file = scaled_input(input_file, scale, scratch)
+            size_mb = os.path.getsize(measured_file) / (1024 * 1024)
+            for mode, options in modes:
+                best = float('inf')
+                for _ in range(repeat):
+                    with tempfile.TemporaryDirectory(dir=scratch) as output_dir:
+                        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                            best = min(best, pool.submit(
+                                run_pipeline, measured_file, output_dir, dict(options, decoder=decoder)
+                            ).result())
+                print(f"{os.path.basename(input_file):40} {mode:22} {best:8.3f} {size_mb / best:7.2f}")
+
+def parse_size(size):
+    """Turn a size such as 500M, 1G or 10G into bytes"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    if size[-1:].upper() in units:
+        return int(float(size[:-1]) * units[size[-1:].upper()])
+    return int(size)
+
+def synthesize_input(input_file, target_bytes, output_dir):
+    """Write a copy of input_file grown to about target_bytes by replicating its Parameters records with fresh IDs"""
+    with open(input_file, 'r', encoding='utf-8-sig') as f:
+        records = [line.rstrip('\n') for line in f if line.strip()]
+
+    # The IDs of each record and its resources, longest first so none is replaced inside another
+    id_patterns = []
+    for line in records:
+        record = json.loads(line)
+        ids = {record['id']}
+        ids.update(param['resource']['id'] for param in record['parameter'] if 'id' in param.get('resource', {}))
+        id_patterns.append(re.compile('|'.join(re.escape(i) for i in sorted(ids, key=len, reverse=True))))
+
+    synthetic_file = os.path.join(output_dir, f"synthetic-{target_bytes // 1024 ** 2}MB-{os.path.basename(input_file)}")
+    written = 0
+    copy = 0
+    with open(synthetic_file, 'w', encoding='utf-8') as f:
+        while written < target_bytes:
+            for line, pattern in zip(records, id_patterns):
+                # IDs and the references to them get the same copy suffix
+                if copy:
+                    line = pattern.sub(lambda match: f"{match.group(0)}.copy{copy}", line)
+                f.write(line + '\n')
+                written += len(line) + 1
+            copy += 1
+    return synthetic_file
+
+def run_end_to_end(input_file, output_dir, decoder):
+    """Convert a file like the CLI does and return its throughput, peak RSS and phase timings (pool worker)"""
+    converter = load_converter()
+
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(input_file, output_dir, streaming=True, decoder=decoder,
+                                                           instrument=True)
+        fhir.process_file()
+        fhir.export_to_quoted_pipe_delimited_no_header()
+        fhir.generate_schema_sql()
+        fhir.generate_microsoft_access_sql()
+        fhir.generate_field_maps()
+        seconds = time.perf_counter() - start
+        telemetry = fhir.report_telemetry()
+
+    size_mb = os.path.getsize(input_file) / (1024 * 1024)
+    records = telemetry['rows']['parameters']
+    return {
+        'file': os.path.basename(input_file),
+        'size_mb': round(size_mb, 3),
+        'records': records,
+        'rows': sum(telemetry['rows'].values()),
+        'seconds': round(seconds, 4),
+        'records_per_s': round(records / seconds, 1),
+        'mb_per_s': round(size_mb / seconds, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'phases': {phase: round(elapsed, 4) for phase, elapsed in telemetry['phases'].items()}
+    }
+
+def normalized_output(path):
+    """Read an output file with CRLF line endings and the schema generation timestamps removed"""
+    with open(path, 'rb') as f:
+        lines = f.read().replace(b'\r\n', b'\n').split(b'\n')
+    return [line for line in lines if not re.match(rb'\W*Generated on ', line)]
+
+def compare_outputs(output_dir, reference_dir):
+    """Return the differences between a fresh output directory and a checked-in one"""
+    differences = []
+    found = {os.path.relpath(path, output_dir) for path in glob.glob(os.path.join(output_dir, '**', '*.*'), recursive=True)}
+    expected = {os.path.relpath(path, reference_dir) for path in glob.glob(os.path.join(reference_dir, '**', '*.*'), recursive=True)}
+
+    for name in sorted(expected - found):
+        differences.append(f"missing {name}")
+    for name in sorted(found - expected):
+        differences.append(f"unexpected {name}")
+    for name in sorted(found & expected):
+        if normalized_output(os.path.join(output_dir, name)) != normalized_output(os.path.join(reference_dir, name)):
+            differences.append(f"differs {name}")
+    return differences
+
+def check_parquet_decimals(converter, input_file, output_dir):
+    """Return the differences found converting quantities with more decimal places than the Parquet scale"""
+    with open(input_file, 'r', encoding='utf-8-sig') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    # Seven places, and a half that rounds to the even neighbour, in the first two dispensed quantities
+    quantities = ['0.1234567', '2.0000005']
+    for record in records:
+        for param in record['parameter']:
+            resource = param.get('resource', {})
+            if quantities and resource.get('resourceType') == 'MedicationDispense' and 'quantity' in resource:
+                resource['quantity']['value'] = float(quantities.pop(0))
+    if quantities:
+        return []
+
+    os.makedirs(output_dir)
+    edited_file = os.path.join(output_dir, os.path.basename(input_file))
+    with open(edited_file, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(record) + '\n' for record in records)
+
+    with redirect_stdout(io.StringIO()):
+        fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(edited_file, output_dir, output_format='parquet')
+        fhir.process_file()
+        try:
+            fhir.export_to_parquet()
+        except Exception as e:
+            return [f"Parquet export failed: {e}"]
+
+    found = converter.pyarrow.parquet.read_table(
+        os.path.join(output_dir, 'medication_dispenses.parquet'), columns=['quantity_value']
+    ).column('quantity_value').to_pylist()[:2]
+    expected = [converter.Decimal('0.123457'), converter.Decimal('2.000000')]
+    return [] if found == expected else [f"quantity_value {found} instead of {expected}"]
+
+def check_parquet_dates(converter, input_file, output_dir):
+    """Return the differences found converting partial and invalid birth dates to Parquet"""
+    with open(input_file, 'r', encoding='utf-8-sig') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    # A year, a year and month, and a day that does not exist, in the last birth dates so a
+    # streaming run has already written the full dates of the earlier ones as dates
+    patients = [
+        param['resource'] for record in records for param in record['parameter']
+        if param.get('resource', {}).get('resourceType') == 'Patient' and 'birthDate' in param['resource']
+    ]
+    if len(patients) < 4:
+        return []
+    for patient, birth_date in zip(patients[-3:], ['1980', '1980-05', '1980-02-30']):
+        patient['birthDate'] = birth_date
+    expected = [patient['birthDate'] for patient in patients]
+
+    os.makedirs(output_dir)
+    edited_file = os.path.join(output_dir, os.path.basename(input_file))
+    with open(edited_file, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(record) + '\n' for record in records)
+
+    with redirect_stdout(io.StringIO()):
+        fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(
+            edited_file, output_dir, output_format='parquet', streaming=True, batch_size=len(patients) // 2
+        )
+        try:
+            fhir.process_file()
+            fhir.export_to_parquet()
+        except Exception as e:
+            return [f"Parquet export with partial dates failed: {e}"]
+
+    found = converter.pyarrow.parquet.read_table(
+        os.path.join(output_dir, 'patients.parquet'), columns=['birthDate']
+    ).column('birthDate').to_pylist()
+    found = [value for value in found if value is not None]
+    return [] if found == expected else [f"birthDate {found[-3:]} instead of {expected[-3:]}"]
+
+def read_table_files(converter, output_dir, table):
+    """Return the rows of a table from its plain, compressed or part files, in order"""
+    paths = sorted(glob.glob(os.path.join(output_dir, f"{table}.csv*")))
+    paths += sorted(glob.glob(os.path.join(output_dir, f"{table}.part-*.csv*")))
+
+    rows = []
+    for path in paths:
+        if path.endswith('.gz'):
+            f = gzip.open(path, 'rt', encoding='utf-8', newline='')
+        elif path.endswith('.zst'):
+            f = converter.zstandard.open(path, 'rt', encoding='utf-8', newline='')
+        else:
+            f = open(path, 'r', encoding='utf-8', newline='')
+        with f:
+            rows += [tuple(row) for row in csv.reader(f, delimiter='|')]
+    return rows
+
+def read_parquet_rows(converter, output_dir, table):
+    """Return the rows of a table's Parquet file with nulls, dates and integers as in the table files"""
+    path = os.path.join(output_dir, f"{table}.parquet")
+    if not os.path.exists(path):
+        return []
+
+    # value_boolean is a typed copy of parameter_values.value, the table files have no such column
+    data = converter.pyarrow.parquet.read_table(path)
+    columns = [name for name in data.column_names if name != 'value_boolean']
+    rows = []
+    for record in data.select(columns).to_pylist():
+        rows.append(tuple(
+            '' if value is None else value if isinstance(value, (str, converter.Decimal))
+            else value.isoformat() if isinstance(value, converter.date) else str(value)
+            for value in (record[col] for col in columns)
+        ))
+    return rows
+
+def decimal_rows(converter, output_dir, table, rows):
+    """Return rows with the values of a table's Parquet decimal columns as Decimals, to compare numerically"""
+    schema = converter.pyarrow.parquet.read_schema(os.path.join(output_dir, f"{table}.parquet"))
+    decimals = [i for i, field in enumerate(schema) if converter.pyarrow.types.is_decimal(field.type)]
+    return [
+        tuple(converter.Decimal(value) if i in decimals and value != '' else value for i, value in enumerate(row))
+        for row in rows
+    ]
+
+def denormalized_rows(rows, tables, normalized_tables):
+    """Join the codes and code_systems lookups back into the code and system columns of normalized tables"""
+    systems = {row[0]: row[1] for row in rows['code_systems']}
+    codes = {row[0]: (row[2], systems.get(row[1], '')) for row in rows['codes']}
+
+    joined = {}
+    for table, normalized in normalized_tables.items():
+        if table not in tables:
+            continue
+        joined[table] = []
+        for row in rows[table]:
+            values = dict(zip(normalized, row))
+            joined_row = []
+            for col in tables[table]:
+                if col in values:
+                    joined_row.append(values[col])
+                elif f"{col}_id" in values:
+                    joined_row.append(codes.get(values[f"{col}_id"], ('', ''))[0])
+                else:  # The system of the code column it was paired with
+                    joined_row.append(codes.get(values[f"{col[:-6]}code_id"], ('', ''))[1])
+            joined[table].append(tuple(joined_row))
+    return joined
+
+def convert_in_mode(converter, input_file, output_dir, export='csv', **options):
+    """Convert a file to table files, Parquet or an in-memory SQLite database and return the converter"""
+    with redirect_stdout(io.StringIO()):
+        if export == 'sqlite':
+            options['database'] = sqlite3.connect(':memory:')
+        fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(
+            input_file, output_dir, output_format='parquet' if export == 'parquet' else 'csv', **options
+        )
+        fhir.process_file()
+        if export == 'parquet':
+            fhir.export_to_parquet()
+        elif export == 'sqlite':
+            fhir.export_to_database()
+        else:
+            fhir.export_to_quoted_pipe_delimited_no_header()
+    return fhir
+
+def check_modes(converter, input_file, reference_dir, scratch):
+    """Return the differences between the checked-in rows of a bundled file and its rows in the other conversion modes"""
+    os.makedirs(scratch)
+    with redirect_stdout(io.StringIO()):
+        tables = converter.FHIRToQuotedPipeDelimitedNoHeader(input_file, os.path.join(scratch, 'default')).tables
+    expected = {table: read_table_files(converter, reference_dir, table) for table in tables}
+    found = {}
+
+    # Modes that must write the same table files
+    modes = {
+        'shard workers': {'workers': 2},
+        'pipeline': {'streaming': True, 'pipeline': True, 'batch_size': 100},
+        'gzip parts': {'streaming': True, 'compression': 'gzip', 'part_rows': 100},
+        'bz2 input': {'input_file': compress_input(input_file, 'bz2', scratch)},
+        'gzip input': {'input_file': compress_input(input_file, 'gzip', scratch)},
+    }
+    if converter.zstandard is not None:
+        modes['zstd input'] = {'input_file': compress_input(input_file, 'zstd', scratch)}
+        modes['zstd parts'] = {'streaming': True, 'compression': 'zstd', 'part_rows': 100}
+    for mode, options in modes.items():
+        output_dir = os.path.join(scratch, mode)
+        convert_in_mode(converter, options.pop('input_file', input_file), output_dir, **options)
+        found[mode] = {table: read_table_files(converter, output_dir, table) for table in tables}
+
+    # A checkpointed run over the first half of the file, resumed once the file is complete
+    with open(input_file, 'rb') as f:
+        lines = f.readlines()
+    growing_file = os.path.join(scratch, os.path.basename(input_file))
+    with open(growing_file, 'wb') as f:
+        f.writelines(lines[:len(lines) // 2])
+    output_dir = os.path.join(scratch, 'checkpoint')
+    convert_in_mode(converter, growing_file, output_dir, streaming=True, checkpoint=True, batch_size=100)
+    shutil.copyfile(input_file, growing_file)
+    convert_in_mode(converter, growing_file, output_dir, streaming=True, checkpoint=True, batch_size=100)
+    found['checkpoint resume'] = {table: read_table_files(converter, output_dir, table) for table in tables}
+
+    # The run filling the record cache, then the one reading every record from it
+    cache_path = os.path.join(scratch, 'records.sqlite')
+    for mode in ['cold record cache', 'warm record cache']:
+        output_dir = os.path.join(scratch, mode)
+        convert_in_mode(converter, input_file, output_dir, streaming=True, record_cache=cache_path)
+        found[mode] = {table: read_table_files(converter, output_dir, table) for table in tables}
+
+    # Tables reloaded from an SQLite database, with the stringified values of the table files
+    fhir = convert_in_mode(converter, input_file, os.path.join(scratch, 'sqlite'), export='sqlite', streaming=True)
+    found['sqlite'] = {
+        table: [
+            tuple('' if value is None else str(value) for value in row)
+            for row in fhir.database.execute(f'SELECT * FROM "{table}"')
+        ]
+        for table in tables
+    }
+
+    differences = []
+    if converter.pyarrow is not None:
+        output_dir = os.path.join(scratch, 'parquet')
+        convert_in_mode(converter, input_file, output_dir, export='parquet', streaming=True)
+        for table in tables:
+            if os.path.exists(os.path.join(output_dir, f"{table}.parquet")):
+                if read_parquet_rows(converter, output_dir, table) != decimal_rows(converter, output_dir, table, expected[table]):
+                    differences.append(f"parquet: differs {table}")
+            elif expected[table]:
+                differences.append(f"parquet: missing {table}")
+
+    # Code and system columns joined back from the lookup tables
+    output_dir = os.path.join(scratch, 'normalized codes')
+    fhir = convert_in_mode(converter, input_file, output_dir, normalize_codes=True)
+    rows = {table: read_table_files(converter, output_dir, table) for table in fhir.tables}
+    found['normalized codes'] = denormalized_rows(rows, tables, fhir.tables)
+
+    # A selection keeps the selected columns, and the parents of selected tables whole
+    output_dir = os.path.join(scratch, 'selection')
+    fhir = convert_in_mode(
+        converter, input_file, output_dir, select=['patient_names', 'claim_items.productOrService_code', 'parameter_values.name']
+    )
+    for table, columns in fhir.tables.items():
+        positions = [tables[table].index(col) for col in columns]
+        if read_table_files(converter, output_dir, table) != [tuple(row[i] for i in positions) for row in expected[table]]:
+            differences.append(f"selection: differs {table}")
+
+    for mode, rows in found.items():
+        for table in rows:
+            if rows[table] != expected[table]:
+                differences.append(f"{mode}: differs {table}")
+    return differences
+
+def benchmark_end_to_end(converter, input_files, decoder='json', sizes=(), results_path=None, baseline_path=None):
+    """Time full conversions, check bundled outputs against the checked-in directories and save the results"""
+    results = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'decoder': decoder,
+        'runs': [],
+        'regressions': {}
+    }
+
+    print(f"{'file':52} {'MB':>8} {'records/s':>10} {'MB/s':>7} {'RSS MB':>7} "
+          f"{'read':>7} {'decode':>7} {'flatten':>8} {'export':>7} {'schema':>7}")
+
+    # Every run gets a fresh interpreter so peak RSS is per run
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as scratch:
+        runs = [(input_file, None) for input_file in input_files]
+        runs += [(input_file, size) for size in sizes for input_file in input_files]
+
+        for i, (input_file, size) in enumerate(runs):
+            # Synthetic inputs are generated one at a time to bound the scratch space
+            if size is not None:
+                input_file = synthesize_input(input_file, parse_size(size), scratch)
+
+            output_dir = os.path.join(scratch, f"output-{i}")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                run = pool.submit(run_end_to_end, input_file, output_dir, decoder).result()
+            results['runs'].append(run)
+
+            phases = run['phases']
+            print(f"{run['file']:52} {run['size_mb']:8.1f} {run['records_per_s']:10.0f} {run['mb_per_s']:7.2f} "
+                  f"{run['peak_rss_mb']:7.1f} {phases['read']:7.3f} {phases['decode']:7.3f} {phases['flatten']:8.3f} "
+                  f"{phases['export']:7.3f} {phases['schema']:7.3f}")
+
+            # Bundled inputs must reproduce their checked-in output directories
+            reference_dir = converter.measure_output_dir(input_file, os.path.dirname(CONVERTER_PATH))
+            if size is None and os.path.isdir(reference_dir):
+                results['regressions'][run['file']] = compare_outputs(output_dir, reference_dir)
+                if converter.pyarrow is not None:
+                    decimals = check_parquet_decimals(converter, input_file, os.path.join(scratch, f"decimals-{i}"))
+                    results['regressions'][run['file']] += decimals
+                    dates = check_parquet_dates(converter, input_file, os.path.join(scratch, f"dates-{i}"))
+                    results['regressions'][run['file']] += dates
+                modes = check_modes(converter, input_file, reference_dir, os.path.join(scratch, f"modes-{i}"))
+                results['regressions'][run['file']] += modes
+            else:
+                os.remove(input_file)
+            shutil.rmtree(output_dir)
+
+    failed = False
+    print()
+    for name, differences in results['regressions'].items():
+        print(f"{name}: {'identical to the checked-in output' if not differences else 'OUTPUT CHANGED'}")
+        for difference in differences:
+            print(f"  {difference}")
+        failed = failed or bool(differences)
+
+    if baseline_path:
+        with open(baseline_path, 'r') as f:
+            baseline = {run['file']: run for run in json.load(f)['runs']}
+        print(f"\nCompared with {baseline_path}:")
+        for run in results['runs']:
+            previous = baseline.get(run['file'])
+            if previous:
+                change = (run['mb_per_s'] / previous['mb_per_s'] - 1) * 100
+                print(f"  {run['file']:52} {previous['mb_per_s']:7.2f} -> {run['mb_per_s']:7.2f} MB/s ({change:+.1f}%)")
+
+    if results_path:
+        with open(results_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {results_path}")
+    return not failed
+
+def benchmark_cache(converter, input_files, repeat=3, scale=1, decoder='json'):
+    """Compare a conversion without the record cache with a run filling the cache and a re-run reusing it"""
+    print(f"{'file':40} {'mode':12} {'seconds':>8} {'MB/s':>7} {'cache MB':>8}")
+
+    with tempfile.TemporaryDirectory() as scratch:
+        cache_path = os.path.join(scratch, 'records.sqlite')
+        for input_file in input_files:
+            # Fresh IDs per copy, so every line is distinct like the records of a daily extract
+            measured_file = synthesize_input(input_file, os.path.getsize(input_file) * scale, scratch)
+            size_mb = os.path.getsize(measured_file) / (1024 * 1024)
+            for mode in ['no cache', 'cold cache', 'warm cache']:
+                best = float('inf')
+                for _ in range(repeat):
+                    if mode == 'cold cache':
+                        for path in glob.glob(cache_path + '*'):
+                            os.remove(path)
+                    options = {} if mode == 'no cache' else {'record_cache': cache_path}
+                    with tempfile.TemporaryDirectory(dir=scratch) as output_dir:
+                        start = time.perf_counter()
+                        with redirect_stdout(io.StringIO()):
+                            fhir = converter.FHIRToQuotedPipeDelimitedNoHeader(
+                                measured_file, output_dir, streaming=True, decoder=decoder, **options
+                            )
+                            fhir.process_file()
+                            fhir.export_to_quoted_pipe_delimited_no_header()
+                        best = min(best, time.perf_counter() - start)
+                cache_mb = os.path.getsize(cache_path) / (1024 * 1024) if options else 0
+                print(f"{os.path.basename(input_file):40} {mode:12} {best:8.3f} {size_mb / best:7.2f} {cache_mb:8.1f}")
+            for path in glob.glob(cache_path + '*'):
+                os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the FHIR supporting evidence converter')
+    parser.add_argument('inputs', nargs='*', help='NDJSON files to benchmark (default: the bundled measure files)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, the fastest is reported')
+    parser.add_argument('--suite', choices=['decoders', 'flatten', 'projection', 'memory', 'end-to-end', 'readers', 'export', 'pipeline', 'cache'], default='decoders', help='what to benchmark')
+    parser.add_argument('--scale', type=int, default=1, help='repeat the input lines this many times (memory, readers, export and pipeline suites), or grow it this many times with fresh IDs (cache suite)')
+    parser.add_argument('--select', default='patients,parameter_values', help='tables kept by the projection suite')
+    parser.add_argument('--decoder', default='json', help='JSON decoder of the end-to-end, readers, pipeline and cache suites')
+    parser.add_argument('--synthetic', action='append', default=[], metavar='SIZE',
+                        help='also convert inputs grown to SIZE (e.g. 1G, 10G) with fresh IDs (end-to-end suite, repeatable)')
+    parser.add_argument('--results', help='save the end-to-end results as JSON to this file')
+    parser.add_argument('--baseline', help='earlier end-to-end results JSON to compare throughput with')
+    args = parser.parse_args()
+
+    converter = load_converter()
+    input_files = args.inputs or bundled_inputs()
+    if args.suite == 'flatten':
+        benchmark_flatten(converter, input_files, args.repeat)
+    elif args.suite == 'end-to-end':
+        if not benchmark_end_to_end(converter, input_files, args.decoder, args.synthetic, args.results, args.baseline):
+            sys.exit(1)
+    elif args.suite == 'pipeline':
+        benchmark_pipeline(converter, input_files, args.repeat, args.scale, args.decoder)
+    elif args.suite == 'cache':
+        benchmark_cache(converter, input_files, args.repeat, args.scale, args.decoder)
+    elif args.suite == 'export':
+        benchmark_export(converter, input_files, args.repeat, args.scale)
+    elif args.suite == 'readers':
+        benchmark_readers(converter, input_files, args.scale, args.decoder)
+    elif args.suite == 'memory':
+        benchmark_memory(converter, input_files, args.scale)
+    elif args.suite == 'projection':
+        benchmark_projection(converter, input_files, args.repeat, args.select.split(','))
+    else:
+        benchmark_decoders(converter, input_files, args.repeat)
+
+if __name__ == "__main__":
+    main()
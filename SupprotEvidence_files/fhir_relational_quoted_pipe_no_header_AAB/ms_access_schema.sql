@@ -1,16 +1,16 @@
 /* FHIR to Relational Database Schema for Microsoft Access
-   Generated on 2025-04-07 14:08:02 */
+   Generated on 2026-10-17 23:06:46 */
 
 CREATE TABLE parameters (
-    id TEXT(50) PRIMARY KEY,
-    resourceType TEXT(255)
+    id TEXT(42) NOT NULL PRIMARY KEY,
+    resourceType TEXT(10)
 );
 
 CREATE TABLE patients (
-    id TEXT(50) PRIMARY KEY,
-    parameters_id TEXT(50),
-    gender TEXT(255),
-    birthDate TEXT(255),
+    id TEXT(24) NOT NULL PRIMARY KEY,
+    parameters_id TEXT(42) CONSTRAINT fk_patients_parameters_id REFERENCES parameters (id),
+    gender TEXT(6),
+    birthDate DATETIME,
     race_code TEXT(255),
     race_system TEXT(255),
     ethnicity_code TEXT(255),
@@ -18,101 +18,204 @@ CREATE TABLE patients (
 );
 
 CREATE TABLE patient_identifiers (
-    id TEXT(50) PRIMARY KEY,
-    patient_id TEXT(50),
-    system TEXT(255),
-    value MEMO,
+    id COUNTER PRIMARY KEY,
+    patient_id TEXT(24) CONSTRAINT fk_patient_identifiers_patient_id REFERENCES patients (id),
+    system TEXT(44),
+    value TEXT(5),
     [use] TEXT(255)
 );
 
 CREATE TABLE patient_names (
-    id TEXT(50) PRIMARY KEY,
-    patient_id TEXT(50),
-    family TEXT(255),
-    given TEXT(255)
+    id COUNTER PRIMARY KEY,
+    patient_id TEXT(24) CONSTRAINT fk_patient_names_patient_id REFERENCES patients (id),
+    family TEXT(9),
+    given TEXT(13)
 );
 
 CREATE TABLE patient_telecom (
-    id TEXT(50) PRIMARY KEY,
-    patient_id TEXT(50),
-    system TEXT(255),
-    value MEMO
+    id COUNTER PRIMARY KEY,
+    patient_id TEXT(24) CONSTRAINT fk_patient_telecom_patient_id REFERENCES patients (id),
+    system TEXT(5),
+    value TEXT(10)
 );
 
 CREATE TABLE patient_addresses (
-    id TEXT(50) PRIMARY KEY,
-    patient_id TEXT(50),
-    line MEMO,
-    city TEXT(255),
-    state TEXT(255),
-    postalCode TEXT(255)
+    id COUNTER PRIMARY KEY,
+    patient_id TEXT(24) CONSTRAINT fk_patient_addresses_patient_id REFERENCES patients (id),
+    line TEXT(17),
+    city TEXT(4),
+    state TEXT(2),
+    postalCode TEXT(5)
 );
 
 CREATE TABLE claims (
-    id COUNTER PRIMARY KEY,
-    parameters_id TEXT(50),
-    [type] TEXT(255),
-    patient_id TEXT(50),
-    servicedDate TEXT(255)
+    id TEXT(33) NOT NULL,
+    parameters_id TEXT(42) CONSTRAINT fk_claims_parameters_id REFERENCES parameters (id),
+    [type] TEXT(13),
+    patient_id TEXT(24) CONSTRAINT fk_claims_patient_id REFERENCES patients (id),
+    servicedDate DATETIME
 );
 
 CREATE TABLE claim_diagnoses (
     id COUNTER PRIMARY KEY,
-    claim_id TEXT(50),
-    sequence TEXT(255),
-    code TEXT(255),
-    system TEXT(255)
+    claim_id TEXT(24),
+    sequence LONG,
+    code TEXT(7),
+    system TEXT(33)
 );
 
 CREATE TABLE claim_items (
     id COUNTER PRIMARY KEY,
-    claim_id TEXT(50),
-    sequence TEXT(255),
-    productOrService_code TEXT(255),
-    productOrService_system TEXT(255),
-    servicedDate TEXT(255)
+    claim_id TEXT(33),
+    sequence LONG,
+    productOrService_code TEXT(11),
+    productOrService_system TEXT(56),
+    servicedDate DATETIME
 );
 
 CREATE TABLE explanation_of_benefits (
-    id COUNTER PRIMARY KEY,
-    parameters_id TEXT(50),
-    status TEXT(255),
-    [type] TEXT(255),
-    patient_id TEXT(50),
-    outcome TEXT(255)
+    id TEXT(48) NOT NULL,
+    parameters_id TEXT(42) CONSTRAINT fk_explanation_of_benefits_parameters_id REFERENCES parameters (id),
+    status TEXT(9),
+    [type] TEXT(13),
+    patient_id TEXT(24) CONSTRAINT fk_explanation_of_benefits_patient_id REFERENCES patients (id),
+    outcome TEXT(8)
 );
 
 CREATE TABLE eob_diagnoses (
     id COUNTER PRIMARY KEY,
-    eob_id TEXT(50),
-    sequence TEXT(255),
-    code TEXT(255),
-    system TEXT(255)
+    eob_id TEXT(39),
+    sequence LONG,
+    code TEXT(7),
+    system TEXT(33)
 );
 
 CREATE TABLE eob_items (
     id COUNTER PRIMARY KEY,
-    eob_id TEXT(50),
-    sequence TEXT(255),
-    productOrService_code TEXT(255),
-    productOrService_system TEXT(255),
-    servicedDate TEXT(255)
+    eob_id TEXT(48),
+    sequence LONG,
+    productOrService_code TEXT(14),
+    productOrService_system TEXT(56),
+    servicedDate DATETIME
 );
 
 CREATE TABLE eob_adjudications (
     id COUNTER PRIMARY KEY,
-    eob_item_id TEXT(50),
+    eob_item_id LONG CONSTRAINT fk_eob_adjudications_eob_item_id REFERENCES eob_items (id),
+    category_code TEXT(9),
+    category_system TEXT(70),
+    amount_value DOUBLE,
+    amount_currency TEXT(3)
+);
+
+CREATE TABLE medication_dispenses (
+    id TEXT(255) NOT NULL PRIMARY KEY,
+    parameters_id TEXT(255) CONSTRAINT fk_medication_dispenses_parameters_id REFERENCES parameters (id),
+    status TEXT(255),
+    patient_id TEXT(255) CONSTRAINT fk_medication_dispenses_patient_id REFERENCES patients (id),
+    medication_code TEXT(255),
+    medication_system TEXT(255),
+    quantity_value TEXT(255),
+    quantity_unit TEXT(255),
+    daysSupply_value TEXT(255),
+    whenHandedOver TEXT(255)
+);
+
+CREATE TABLE conditions (
+    id TEXT(255) NOT NULL PRIMARY KEY,
+    parameters_id TEXT(255) CONSTRAINT fk_conditions_parameters_id REFERENCES parameters (id),
+    clinical_status TEXT(255),
     category_code TEXT(255),
     category_system TEXT(255),
-    amount_value TEXT(255),
-    amount_currency TEXT(255)
+    patient_id TEXT(255) CONSTRAINT fk_conditions_patient_id REFERENCES patients (id),
+    code TEXT(255),
+    system TEXT(255),
+    onsetDateTime TEXT(255),
+    abatementDateTime TEXT(255)
+);
+
+CREATE TABLE observations (
+    id TEXT(255) NOT NULL PRIMARY KEY,
+    parameters_id TEXT(255) CONSTRAINT fk_observations_parameters_id REFERENCES parameters (id),
+    status TEXT(255),
+    category_code TEXT(255),
+    category_system TEXT(255),
+    patient_id TEXT(255) CONSTRAINT fk_observations_patient_id REFERENCES patients (id),
+    code TEXT(255),
+    system TEXT(255),
+    effectiveDateTime TEXT(255),
+    effectivePeriod_start TEXT(255),
+    effectivePeriod_end TEXT(255),
+    valueQuantity_value TEXT(255),
+    valueQuantity_unit TEXT(255),
+    valueCodeableConcept_code TEXT(255),
+    valueCodeableConcept_system TEXT(255)
+);
+
+CREATE TABLE encounters (
+    id TEXT(35) NOT NULL PRIMARY KEY,
+    parameters_id TEXT(42) CONSTRAINT fk_encounters_parameters_id REFERENCES parameters (id),
+    status TEXT(8),
+    class_code TEXT(7),
+    class_system TEXT(56),
+    type_code TEXT(9),
+    type_system TEXT(35),
+    patient_id TEXT(24) CONSTRAINT fk_encounters_patient_id REFERENCES patients (id),
+    period_start TEXT(29),
+    period_end TEXT(29)
+);
+
+CREATE TABLE procedures (
+    id TEXT(34) NOT NULL PRIMARY KEY,
+    parameters_id TEXT(42) CONSTRAINT fk_procedures_parameters_id REFERENCES parameters (id),
+    status TEXT(9),
+    patient_id TEXT(24) CONSTRAINT fk_procedures_patient_id REFERENCES patients (id),
+    code TEXT(9),
+    system TEXT(35),
+    performedDateTime TEXT(255),
+    performedPeriod_start TEXT(29),
+    performedPeriod_end TEXT(29)
 );
 
 CREATE TABLE parameter_values (
     id COUNTER PRIMARY KEY,
-    parameters_id TEXT(50),
-    name TEXT(255),
-    value_type TEXT(255),
-    value MEMO
+    parameters_id TEXT(42) CONSTRAINT fk_parameter_values_parameters_id REFERENCES parameters (id),
+    name TEXT(65),
+    value_type TEXT(7),
+    value TEXT(44)
 );
 
+/* claim_diagnoses.claim_id has no foreign key, claims.id repeats across Parameters records */
+/* claim_items.claim_id has no foreign key, claims.id repeats across Parameters records */
+/* eob_diagnoses.eob_id has no foreign key, explanation_of_benefits.id repeats across Parameters records */
+/* eob_items.eob_id has no foreign key, explanation_of_benefits.id repeats across Parameters records */
+
+/* Indexes on the join columns */
+CREATE INDEX ix_patients_parameters_id ON patients (parameters_id);
+CREATE INDEX ix_patient_identifiers_patient_id ON patient_identifiers (patient_id);
+CREATE INDEX ix_patient_names_patient_id ON patient_names (patient_id);
+CREATE INDEX ix_patient_telecom_patient_id ON patient_telecom (patient_id);
+CREATE INDEX ix_patient_addresses_patient_id ON patient_addresses (patient_id);
+CREATE INDEX ix_claims_id ON claims (id);
+CREATE INDEX ix_claims_parameters_id ON claims (parameters_id);
+CREATE INDEX ix_claims_patient_id ON claims (patient_id);
+CREATE INDEX ix_claim_diagnoses_claim_id ON claim_diagnoses (claim_id);
+CREATE INDEX ix_claim_items_claim_id ON claim_items (claim_id);
+CREATE INDEX ix_explanation_of_benefits_id ON explanation_of_benefits (id);
+CREATE INDEX ix_explanation_of_benefits_parameters_id ON explanation_of_benefits (parameters_id);
+CREATE INDEX ix_explanation_of_benefits_patient_id ON explanation_of_benefits (patient_id);
+CREATE INDEX ix_eob_diagnoses_eob_id ON eob_diagnoses (eob_id);
+CREATE INDEX ix_eob_items_eob_id ON eob_items (eob_id);
+CREATE INDEX ix_eob_adjudications_eob_item_id ON eob_adjudications (eob_item_id);
+CREATE INDEX ix_medication_dispenses_parameters_id ON medication_dispenses (parameters_id);
+CREATE INDEX ix_medication_dispenses_patient_id ON medication_dispenses (patient_id);
+CREATE INDEX ix_conditions_parameters_id ON conditions (parameters_id);
+CREATE INDEX ix_conditions_patient_id ON conditions (patient_id);
+CREATE INDEX ix_observations_parameters_id ON observations (parameters_id);
+CREATE INDEX ix_observations_patient_id ON observations (patient_id);
+CREATE INDEX ix_encounters_parameters_id ON encounters (parameters_id);
+CREATE INDEX ix_encounters_patient_id ON encounters (patient_id);
+CREATE INDEX ix_procedures_parameters_id ON procedures (parameters_id);
+CREATE INDEX ix_procedures_patient_id ON procedures (patient_id);
+CREATE INDEX ix_parameter_values_parameters_id ON parameter_values (parameters_id);
+
@@ -1,16 +1,16 @@
 -- FHIR to Relational Database Schema
--- Generated on 2025-04-07 14:06:46
+-- Generated on 2026-10-17 23:06:46
 
 CREATE TABLE parameters (
-    id INTEGER PRIMARY KEY,
-    resourceType TEXT
+    id VARCHAR(40) NOT NULL PRIMARY KEY,
+    resourceType VARCHAR(10)
 );
 
 CREATE TABLE patients (
-    id INTEGER PRIMARY KEY,
-    parameters_id TEXT -- Foreign key to parameters(id),
-    gender TEXT,
-    birthDate TEXT,
+    id VARCHAR(24) NOT NULL PRIMARY KEY,
+    parameters_id VARCHAR(40) CONSTRAINT fk_patients_parameters_id REFERENCES parameters (id),
+    gender VARCHAR(6),
+    birthDate DATE,
     race_code TEXT,
     race_system TEXT,
     ethnicity_code TEXT,
@@ -18,101 +18,197 @@ CREATE TABLE patients (
 );
 
 CREATE TABLE patient_identifiers (
-    id INTEGER PRIMARY KEY,
-    patient_id TEXT -- Foreign key to patient(id),
-    system TEXT,
-    value TEXT,
+    id INTEGER NOT NULL PRIMARY KEY,
+    patient_id VARCHAR(24) CONSTRAINT fk_patient_identifiers_patient_id REFERENCES patients (id),
+    system VARCHAR(44),
+    value VARCHAR(5),
     use TEXT
 );
 
 CREATE TABLE patient_names (
-    id INTEGER PRIMARY KEY,
-    patient_id TEXT -- Foreign key to patient(id),
-    family TEXT,
-    given TEXT
+    id INTEGER NOT NULL PRIMARY KEY,
+    patient_id VARCHAR(24) CONSTRAINT fk_patient_names_patient_id REFERENCES patients (id),
+    family VARCHAR(9),
+    given VARCHAR(13)
 );
 
 CREATE TABLE patient_telecom (
-    id INTEGER PRIMARY KEY,
-    patient_id TEXT -- Foreign key to patient(id),
-    system TEXT,
-    value TEXT
+    id INTEGER NOT NULL PRIMARY KEY,
+    patient_id VARCHAR(24) CONSTRAINT fk_patient_telecom_patient_id REFERENCES patients (id),
+    system VARCHAR(5),
+    value VARCHAR(10)
 );
 
 CREATE TABLE patient_addresses (
-    id INTEGER PRIMARY KEY,
-    patient_id TEXT -- Foreign key to patient(id),
-    line TEXT,
-    city TEXT,
-    state TEXT,
-    postalCode TEXT
+    id INTEGER NOT NULL PRIMARY KEY,
+    patient_id VARCHAR(24) CONSTRAINT fk_patient_addresses_patient_id REFERENCES patients (id),
+    line VARCHAR(17),
+    city VARCHAR(4),
+    state VARCHAR(2),
+    postalCode VARCHAR(5)
 );
 
 CREATE TABLE claims (
-    id INTEGER PRIMARY KEY,
-    parameters_id TEXT -- Foreign key to parameters(id),
-    type TEXT,
-    patient_id TEXT -- Foreign key to patient(id),
-    servicedDate TEXT
+    id VARCHAR(24) NOT NULL PRIMARY KEY,
+    parameters_id VARCHAR(40) CONSTRAINT fk_claims_parameters_id REFERENCES parameters (id),
+    type VARCHAR(13),
+    patient_id VARCHAR(24) CONSTRAINT fk_claims_patient_id REFERENCES patients (id),
+    servicedDate DATE
 );
 
 CREATE TABLE claim_diagnoses (
-    id INTEGER PRIMARY KEY,
-    claim_id TEXT -- Foreign key to claim(id),
-    sequence TEXT,
-    code TEXT,
-    system TEXT
+    id INTEGER NOT NULL PRIMARY KEY,
+    claim_id VARCHAR(24) CONSTRAINT fk_claim_diagnoses_claim_id REFERENCES claims (id),
+    sequence INTEGER,
+    code VARCHAR(8),
+    system VARCHAR(33)
 );
 
 CREATE TABLE claim_items (
-    id INTEGER PRIMARY KEY,
-    claim_id TEXT -- Foreign key to claim(id),
-    sequence TEXT,
-    productOrService_code TEXT,
-    productOrService_system TEXT,
-    servicedDate TEXT
+    id INTEGER NOT NULL PRIMARY KEY,
+    claim_id VARCHAR(24) CONSTRAINT fk_claim_items_claim_id REFERENCES claims (id),
+    sequence INTEGER,
+    productOrService_code VARCHAR(7),
+    productOrService_system VARCHAR(56),
+    servicedDate DATE
 );
 
 CREATE TABLE explanation_of_benefits (
-    id INTEGER PRIMARY KEY,
-    parameters_id TEXT -- Foreign key to parameters(id),
-    status TEXT,
-    type TEXT,
-    patient_id TEXT -- Foreign key to patient(id),
-    outcome TEXT
+    id VARCHAR(39) NOT NULL PRIMARY KEY,
+    parameters_id VARCHAR(40) CONSTRAINT fk_explanation_of_benefits_parameters_id REFERENCES parameters (id),
+    status VARCHAR(6),
+    type VARCHAR(13),
+    patient_id VARCHAR(24) CONSTRAINT fk_explanation_of_benefits_patient_id REFERENCES patients (id),
+    outcome VARCHAR(8)
 );
 
 CREATE TABLE eob_diagnoses (
-    id INTEGER PRIMARY KEY,
-    eob_id TEXT -- Foreign key to eob(id),
-    sequence TEXT,
-    code TEXT,
-    system TEXT
+    id INTEGER NOT NULL PRIMARY KEY,
+    eob_id VARCHAR(39) CONSTRAINT fk_eob_diagnoses_eob_id REFERENCES explanation_of_benefits (id),
+    sequence INTEGER,
+    code VARCHAR(8),
+    system VARCHAR(33)
 );
 
 CREATE TABLE eob_items (
-    id INTEGER PRIMARY KEY,
-    eob_id TEXT -- Foreign key to eob(id),
-    sequence TEXT,
-    productOrService_code TEXT,
-    productOrService_system TEXT,
-    servicedDate TEXT
+    id INTEGER NOT NULL PRIMARY KEY,
+    eob_id VARCHAR(39) CONSTRAINT fk_eob_items_eob_id REFERENCES explanation_of_benefits (id),
+    sequence INTEGER,
+    productOrService_code VARCHAR(14),
+    productOrService_system VARCHAR(56),
+    servicedDate DATE
 );
 
 CREATE TABLE eob_adjudications (
-    id INTEGER PRIMARY KEY,
-    eob_item_id TEXT -- Foreign key to eob_item(id),
+    id INTEGER NOT NULL PRIMARY KEY,
+    eob_item_id INTEGER CONSTRAINT fk_eob_adjudications_eob_item_id REFERENCES eob_items (id),
+    category_code VARCHAR(9),
+    category_system VARCHAR(70),
+    amount_value DECIMAL(18, 6),
+    amount_currency VARCHAR(3)
+);
+
+CREATE TABLE medication_dispenses (
+    id TEXT NOT NULL PRIMARY KEY,
+    parameters_id TEXT CONSTRAINT fk_medication_dispenses_parameters_id REFERENCES parameters (id),
+    status TEXT,
+    patient_id TEXT CONSTRAINT fk_medication_dispenses_patient_id REFERENCES patients (id),
+    medication_code TEXT,
+    medication_system TEXT,
+    quantity_value TEXT,
+    quantity_unit TEXT,
+    daysSupply_value TEXT,
+    whenHandedOver TEXT
+);
+
+CREATE TABLE conditions (
+    id TEXT NOT NULL PRIMARY KEY,
+    parameters_id TEXT CONSTRAINT fk_conditions_parameters_id REFERENCES parameters (id),
+    clinical_status TEXT,
     category_code TEXT,
     category_system TEXT,
-    amount_value TEXT,
-    amount_currency TEXT
+    patient_id TEXT CONSTRAINT fk_conditions_patient_id REFERENCES patients (id),
+    code TEXT,
+    system TEXT,
+    onsetDateTime TEXT,
+    abatementDateTime TEXT
+);
+
+CREATE TABLE observations (
+    id VARCHAR(35) NOT NULL PRIMARY KEY,
+    parameters_id VARCHAR(40) CONSTRAINT fk_observations_parameters_id REFERENCES parameters (id),
+    status VARCHAR(5),
+    category_code VARCHAR(10),
+    category_system VARCHAR(58),
+    patient_id VARCHAR(24) CONSTRAINT fk_observations_patient_id REFERENCES patients (id),
+    code VARCHAR(7),
+    system VARCHAR(30),
+    effectiveDateTime TIMESTAMP WITH TIME ZONE,
+    effectivePeriod_start TIMESTAMP WITH TIME ZONE,
+    effectivePeriod_end TIMESTAMP WITH TIME ZONE,
+    valueQuantity_value TEXT,
+    valueQuantity_unit TEXT,
+    valueCodeableConcept_code TEXT,
+    valueCodeableConcept_system TEXT
+);
+
+CREATE TABLE encounters (
+    id VARCHAR(35) NOT NULL PRIMARY KEY,
+    parameters_id VARCHAR(40) CONSTRAINT fk_encounters_parameters_id REFERENCES parameters (id),
+    status VARCHAR(8),
+    class_code VARCHAR(7),
+    class_system VARCHAR(56),
+    type_code VARCHAR(9),
+    type_system VARCHAR(35),
+    patient_id VARCHAR(24) CONSTRAINT fk_encounters_patient_id REFERENCES patients (id),
+    period_start TIMESTAMP WITH TIME ZONE,
+    period_end TIMESTAMP WITH TIME ZONE
+);
+
+CREATE TABLE procedures (
+    id VARCHAR(34) NOT NULL PRIMARY KEY,
+    parameters_id VARCHAR(40) CONSTRAINT fk_procedures_parameters_id REFERENCES parameters (id),
+    status VARCHAR(9),
+    patient_id VARCHAR(24) CONSTRAINT fk_procedures_patient_id REFERENCES patients (id),
+    code VARCHAR(9),
+    system VARCHAR(35),
+    performedDateTime TEXT,
+    performedPeriod_start TIMESTAMP WITH TIME ZONE,
+    performedPeriod_end TIMESTAMP WITH TIME ZONE
 );
 
 CREATE TABLE parameter_values (
-    id INTEGER PRIMARY KEY,
-    parameters_id TEXT -- Foreign key to parameters(id),
-    name TEXT,
-    value_type TEXT,
-    value TEXT
+    id INTEGER NOT NULL PRIMARY KEY,
+    parameters_id VARCHAR(40) CONSTRAINT fk_parameter_values_parameters_id REFERENCES parameters (id),
+    name VARCHAR(56),
+    value_type VARCHAR(7),
+    value VARCHAR(5)
 );
 
+-- Indexes on the join columns
+CREATE INDEX ix_patients_parameters_id ON patients (parameters_id);
+CREATE INDEX ix_patient_identifiers_patient_id ON patient_identifiers (patient_id);
+CREATE INDEX ix_patient_names_patient_id ON patient_names (patient_id);
+CREATE INDEX ix_patient_telecom_patient_id ON patient_telecom (patient_id);
+CREATE INDEX ix_patient_addresses_patient_id ON patient_addresses (patient_id);
+CREATE INDEX ix_claims_parameters_id ON claims (parameters_id);
+CREATE INDEX ix_claims_patient_id ON claims (patient_id);
+CREATE INDEX ix_claim_diagnoses_claim_id ON claim_diagnoses (claim_id);
+CREATE INDEX ix_claim_items_claim_id ON claim_items (claim_id);
+CREATE INDEX ix_explanation_of_benefits_parameters_id ON explanation_of_benefits (parameters_id);
+CREATE INDEX ix_explanation_of_benefits_patient_id ON explanation_of_benefits (patient_id);
+CREATE INDEX ix_eob_diagnoses_eob_id ON eob_diagnoses (eob_id);
+CREATE INDEX ix_eob_items_eob_id ON eob_items (eob_id);
+CREATE INDEX ix_eob_adjudications_eob_item_id ON eob_adjudications (eob_item_id);
+CREATE INDEX ix_medication_dispenses_parameters_id ON medication_dispenses (parameters_id);
+CREATE INDEX ix_medication_dispenses_patient_id ON medication_dispenses (patient_id);
+CREATE INDEX ix_conditions_parameters_id ON conditions (parameters_id);
+CREATE INDEX ix_conditions_patient_id ON conditions (patient_id);
+CREATE INDEX ix_observations_parameters_id ON observations (parameters_id);
+CREATE INDEX ix_observations_patient_id ON observations (patient_id);
+CREATE INDEX ix_encounters_parameters_id ON encounters (parameters_id);
+CREATE INDEX ix_encounters_patient_id ON encounters (patient_id);
+CREATE INDEX ix_procedures_parameters_id ON procedures (parameters_id);
+CREATE INDEX ix_procedures_patient_id ON procedures (patient_id);
+CREATE INDEX ix_parameter_values_parameters_id ON parameter_values (parameters_id);
+
@@ -1,51 +1,1690 @@
 import json
 import os
+import sys
+import re
 import csv
+import io
+import gzip
+import bz2
+import mmap
+import glob
+import time
+import hashlib
+import itertools
+import shutil
+import sqlite3
+import pickle
+import argparse
+import tempfile
+import logging
+import cProfile
+import pstats
+from collections import deque
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from datetime import datetime
+from decimal import Decimal, ROUND_HALF_EVEN
+from datetime import datetime, date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+UTF8_BOM = b'\xef\xbb\xbf'
+
+# Compressed input formats by the magic bytes their files start with
+COMPRESSION_MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'BZh': 'bz2',
+    b'\x28\xb5\x2f\xfd': 'zstd'
+}
+
+# Input readers: 'auto' detects compression and otherwise reads the file as before
+INPUT_READERS = ['auto', 'file', 'mmap', 'gzip', 'bz2', 'zstd']
+
+# Read buffer of the decompressing readers
+READ_BUFFER_SIZE = 1024 * 1024
+
+# Write buffer of the uncompressed table files
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Kinds of non-empty values recognized by the column statistics; anything else is 'text'
+VALUE_KINDS = [
+    ('int', re.compile(r'-?(0|[1-9][0-9]*)')),
+    ('decimal', re.compile(r'-?[0-9]+\.[0-9]+')),
+    ('date', re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')),
+    ('datetime', re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}(:[0-9]{2}(\.[0-9]+)?)?(Z|[+-][0-9]{2}:[0-9]{2})?'))
+]
+
+def value_kind(value):
+    """Return the kind of a flattened value: 'int', 'decimal', 'date', 'datetime' or 'text'"""
+    if isinstance(value, bool):
+        return 'text'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'decimal'
+    if isinstance(value, str):
+        for kind, pattern in VALUE_KINDS:
+            if pattern.fullmatch(value):
+                return kind
+    return 'text'
+
+def full_date(value):
+    """Return the date of a full FHIR date (YYYY-MM-DD), or None for partial, invalid or non-date values"""
+    if value_kind(value) != 'date':
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:  # e.g. 2021-02-30
+        return None
+
+# Input handed between the stages of the pipeline mode, in chunks of about this many bytes
+PIPELINE_CHUNK_SIZE = 1024 * 1024
+
+# Precision and scale of the Parquet decimal columns; FHIR decimals with more places are rounded to the scale
+PARQUET_DECIMAL_PRECISION = 18
+PARQUET_DECIMAL_SCALE = 6
+
+# Shortest VARCHAR of the key and join columns of loaded databases; FHIR IDs are at most 64 characters
+DATABASE_KEY_LENGTH = 64
+
+# Identifier quote characters of the database drivers that do not use the standard double quote
+DRIVER_IDENTIFIER_QUOTES = {'MySQLdb': '`', 'pymysql': '`', 'mysql': '`', 'mariadb': '`'}
+
+# File name extensions of the compressed table files
+TABLE_COMPRESSION_EXTENSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# Progress and timing reports of instrumented conversions
+logger = logging.getLogger('supp_evidence')
+
+# JSON decoder backends: name -> (reads the file as bytes, loads function)
+JSON_DECODERS = {
+    'json': (False, json.loads),
+    'bytes': (True, json.loads)
+}
+if orjson is not None:
+    JSON_DECODERS['orjson'] = (True, orjson.loads)
+
+def parameters_patterns(encode):
+    """Compile the markers of the compact Parameters line layout, as str or bytes"""
+    return {
+        'header': re.compile(encode(r'\s*\{"resourceType":"Parameters","id":("(?:[^"\\]|\\.)*"),"parameter":\[')),
+        'resource': re.compile(encode(r'\{"name":"(?:[^"\\]|\\.)*","resource":\{"resourceType":"([A-Za-z]+)"')),
+        'value': re.compile(encode(r'\{"name":"(?:[^"\\]|\\.)*","value[A-Za-z]*":')),
+        'separator': encode('},{"name":'),
+        'name': encode('{"name":'),
+        'end': encode(']}'),
+        'close': encode('}'),
+        'comma': encode(','),
+        'array': encode('[%s]')
+    }
+
+# Used to skip parameters without decoding them; lines are str or bytes depending on the decoder
+PARAMETERS_PATTERNS = {str: parameters_patterns(str), bytes: parameters_patterns(str.encode)}
+
+def omb_codings(patient):
+    """Return the last OMB valueCoding of the US Core race and ethnicity extensions"""
+    codings = {'race': {}, 'ethnicity': {}}
+    for ext in patient.get('extension', []):
+        if 'url' in ext and ext['url'].endswith('us-core-race'):
+            for race_ext in ext.get('extension', []):
+                if race_ext.get('url') in ['ombCategory', 'detailed'] and 'valueCoding' in race_ext:
+                    codings['race'] = race_ext['valueCoding']
+        
+        if 'url' in ext and ext['url'].endswith('us-core-ethnicity'):
+            for eth_ext in ext.get('extension', []):
+                if eth_ext.get('url') == 'ombCategory' and 'valueCoding' in eth_ext:
+                    codings['ethnicity'] = eth_ext['valueCoding']
+    return codings
+
+# Keys of the patient index: the Patient resource id, or the value of its original-id
+# identifier, which is the same for a member across measure files
+PATIENT_KEYS = ['id', 'original-id']
+
+def patient_original_id(patient):
+    """Return the value of a patient's original-id identifier ('' when it has none)"""
+    for identifier in patient.get('identifier', []):
+        if identifier.get('system', '').endswith('original-id'):
+            return identifier.get('value', '')
+    return ''
+
+# Declarative mapping of FHIR resource types to tables, compiled once by compile_resource_mapping.
+# A column source is one of:
+#   'a.b[0].c'         path relative to the resource or repeated element ('' when missing)
+#   'item[*].c'        first non-empty c over the elements of a list
+#   '$parameters_id'   id of the enclosing Parameters record
+#   '$counter'         next surrogate ID of the table
+#   '$parent'          id of the parent row
+#   '@name.path'       path relative to the value 'derived' function name returned for the element
+#   (source, name)     a source passed through one of MAPPING_TRANSFORMS
+#   function           called with the resource or element
+#   {'code': source, 'system': source}
+#                      ID of the pair in the codes lookup table (normalized codes, see normalize_code_mapping)
+# 'derived' functions are called once per resource or element, and 'children' are
+# tables filled from the elements of the list at 'each'.
+RESOURCE_MAPPINGS = {
+    'Patient': {
+        'table': 'patients',
+        'derived': {'omb': omb_codings},
+        'columns': {
+            'id': 'id',
+            'parameters_id': '$parameters_id',
+            'gender': 'gender',
+            'birthDate': 'birthDate',
+            'race_code': '@omb.race.code',
+            'race_system': '@omb.race.system',
+            'ethnicity_code': '@omb.ethnicity.code',
+            'ethnicity_system': '@omb.ethnicity.system'
+        },
+        'children': [
+            {
+                'table': 'patient_identifiers',
+                'each': 'identifier',
+                'columns': {'id': '$counter', 'patient_id': '$parent', 'system': 'system', 'value': 'value', 'use': 'use'}
+            },
+            {
+                'table': 'patient_names',
+                'each': 'name',
+                'columns': {'id': '$counter', 'patient_id': '$parent', 'family': 'family', 'given': ('given', 'join')}
+            },
+            {
+                'table': 'patient_telecom',
+                'each': 'telecom',
+                'columns': {'id': '$counter', 'patient_id': '$parent', 'system': 'system', 'value': 'value'}
+            },
+            {
+                'table': 'patient_addresses',
+                'each': 'address',
+                'columns': {
+                    'id': '$counter',
+                    'patient_id': '$parent',
+                    'line': ('line', 'join'),
+                    'city': 'city',
+                    'state': 'state',
+                    'postalCode': 'postalCode'
+                }
+            }
+        ]
+    },
+    'Claim': {
+        'table': 'claims',
+        'columns': {
+            'id': 'id',
+            'parameters_id': '$parameters_id',
+            'type': 'type.coding[0].code',
+            'patient_id': ('patient.reference', 'reference_id'),
+            'servicedDate': 'item[*].servicedDate'
+        },
+        'children': [
+            {
+                'table': 'claim_diagnoses',
+                'each': 'diagnosis',
+                'columns': {
+                    'id': '$counter',
+                    'claim_id': '$parent',
+                    'sequence': 'sequence',
+                    'code': 'diagnosisCodeableConcept.coding[0].code',
+                    'system': 'diagnosisCodeableConcept.coding[0].system'
+                }
+            },
+            {
+                'table': 'claim_items',
+                'each': 'item',
+                'columns': {
+                    'id': '$counter',
+                    'claim_id': '$parent',
+                    'sequence': 'sequence',
+                    'productOrService_code': 'productOrService.coding[0].code',
+                    'productOrService_system': 'productOrService.coding[0].system',
+                    'servicedDate': 'servicedDate'
+                }
+            }
+        ]
+    },
+    'ExplanationOfBenefit': {
+        'table': 'explanation_of_benefits',
+        'columns': {
+            'id': 'id',
+            'parameters_id': '$parameters_id',
+            'status': 'status',
+            'type': 'type.coding[0].code',
+            'patient_id': ('patient.reference', 'reference_id'),
+            'outcome': 'outcome'
+        },
+        'children': [
+            {
+                'table': 'eob_diagnoses',
+                'each': 'diagnosis',
+                'columns': {
+                    'id': '$counter',
+                    'eob_id': '$parent',
+                    'sequence': 'sequence',
+                    'code': 'diagnosisCodeableConcept.coding[0].code',
+                    'system': 'diagnosisCodeableConcept.coding[0].system'
+                }
+            },
+            {
+                'table': 'eob_items',
+                'each': 'item',
+                'columns': {
+                    'id': '$counter',
+                    'eob_id': '$parent',
+                    'sequence': 'sequence',
+                    'productOrService_code': 'productOrService.coding[0].code',
+                    'productOrService_system': 'productOrService.coding[0].system',
+                    'servicedDate': 'servicedDate'
+                },
+                'children': [
+                    {
+                        'table': 'eob_adjudications',
+                        'each': 'adjudication',
+                        'columns': {
+                            'id': '$counter',
+                            'eob_item_id': '$parent',
+                            'category_code': 'category.coding[0].code',
+                            'category_system': 'category.coding[0].system',
+                            'amount_value': ('amount.value', 'str'),
+                            'amount_currency': 'amount.currency'
+                        }
+                    }
+                ]
+            }
+        ]
+    },
+    'MedicationDispense': {
+        'table': 'medication_dispenses',
+        'columns': {
+            'id': 'id',
+            'parameters_id': '$parameters_id',
+            'status': 'status',
+            'patient_id': ('subject.reference', 'reference_id'),
+            'medication_code': 'medicationCodeableConcept.coding[0].code',
+            'medication_system': 'medicationCodeableConcept.coding[0].system',
+            'quantity_value': ('quantity.value', 'str'),
+            'quantity_unit': 'quantity.unit',
+            'daysSupply_value': ('daysSupply.value', 'str'),
+            'whenHandedOver': 'whenHandedOver'
+        }
+    },
+    'Condition': {
+        'table': 'conditions',
+        'columns': {
+            'id': 'id',
+            'parameters_id': '$parameters_id',
+            'clinical_status': 'clinicalStatus.coding[0].code',
+            'category_code': 'category[0].coding[0].code',
+            'category_system': 'category[0].coding[0].system',
+            'patient_id': ('subject.reference', 'reference_id'),
+            'code': 'code.coding[0].code',
+            'system': 'code.coding[0].system',
+            'onsetDateTime': 'onsetDateTime',
+            'abatementDateTime': 'abatementDateTime'
+        }
+    },
+    'Observation': {
+        'table': 'observations',
+        'columns': {
+            'id': 'id',
+            'parameters_id': '$parameters_id',
+            'status': 'status',
+            'category_code': 'category[0].coding[0].code',
+            'category_system': 'category[0].coding[0].system',
+            'patient_id': ('subject.reference', 'reference_id'),
+            'code': 'code.coding[0].code',
+            'system': 'code.coding[0].system',
+            'effectiveDateTime': 'effectiveDateTime',
+            'effectivePeriod_start': 'effectivePeriod.start',
+            'effectivePeriod_end': 'effectivePeriod.end',
+            'valueQuantity_value': ('valueQuantity.value', 'str'),
+            'valueQuantity_unit': 'valueQuantity.unit',
+            'valueCodeableConcept_code': 'valueCodeableConcept.coding[0].code',
+            'valueCodeableConcept_system': 'valueCodeableConcept.coding[0].system'
+        }
+    },
+    'Encounter': {
+        'table': 'encounters',
+        'columns': {
+            'id': 'id',
+            'parameters_id': '$parameters_id',
+            'status': 'status',
+            'class_code': 'class.code',
+            'class_system': 'class.system',
+            'type_code': 'type[0].coding[0].code',
+            'type_system': 'type[0].coding[0].system',
+            'patient_id': ('subject.reference', 'reference_id'),
+            'period_start': 'period.start',
+            'period_end': 'period.end'
+        }
+    },
+    'Procedure': {
+        'table': 'procedures',
+        'columns': {
+            'id': 'id',
+            'parameters_id': '$parameters_id',
+            'status': 'status',
+            'patient_id': ('subject.reference', 'reference_id'),
+            'code': 'code.coding[0].code',
+            'system': 'code.coding[0].system',
+            'performedDateTime': 'performedDateTime',
+            'performedPeriod_start': 'performedPeriod.start',
+            'performedPeriod_end': 'performedPeriod.end'
+        }
+    }
+}
+
+# Expression templates for the named transforms of a column source
+MAPPING_TRANSFORMS = {
+    'str': "str({})",
+    'join': "' '.join({})",
+    'reference_id': "{}.split('/')[-1]"
+}
+
+def parse_mapping_path(path):
+    """Split 'a.b[0].c' into the steps ['a', 'b', 0, 'c']"""
+    steps = []
+    for part in path.split('.'):
+        key, _, index = part.partition('[')
+        steps.append(key)
+        if index:
+            steps.append(int(index.rstrip(']')))
+    return steps
+
+def mapping_tables(mapping, parent=None):
+    """Yield (table, columns, surrogate ID columns) for a mapping and its children, parents first"""
+    surrogate_ids = {}
+    for col, source in mapping['columns'].items():
+        if isinstance(source, dict):
+            surrogate_ids[col] = 'codes'
+        elif source == '$counter':
+            surrogate_ids[col] = mapping['table']
+        elif source == '$parent' and parent is not None and '$counter' in parent['columns'].values():
+            surrogate_ids[col] = parent['table']
+    
+    yield mapping['table'], list(mapping['columns']), surrogate_ids
+    for child in mapping.get('children', []):
+        yield from mapping_tables(child, mapping)
+
+def mapping_content_positions(mapping, skip=()):
+    """Yield (table, positions) of the columns holding resource content for a mapping and its children"""
+    yield mapping['table'], [
+        position for position, (col, source) in enumerate(mapping['columns'].items())
+        if source not in ('$parameters_id', '$counter', '$parent') and col not in skip
+    ]
+    for child in mapping.get('children', []):
+        yield from mapping_content_positions(child)
+
+def parse_selection(select):
+    """Turn ['patients', 'parameter_values.name', ...] into {table: None for all columns, or a list of columns}"""
+    selection = {}
+    for item in select:
+        table, _, col = item.partition('.')
+        if not col:
+            selection[table] = None
+        elif table not in selection or selection[table] is not None:
+            selection.setdefault(table, []).append(col)
+    return selection
+
+def project_mapping(mapping, selection):
+    """Return a copy of a mapping reduced to the selected tables and columns, or None if nothing is selected"""
+    children = [
+        child for child in (project_mapping(child, selection) for child in mapping.get('children', []))
+        if child is not None
+    ]
+    if mapping['table'] not in selection and not children:
+        return None
+    
+    # Parents of selected tables are kept whole, since the child rows reference them
+    columns = selection.get(mapping['table'])
+    if columns is None:
+        return dict(mapping, children=children)
+    
+    # Selected columns keep the keys joining them to other tables: the id of a parent with
+    # children, the reference to the parent row, and to the parameters when they are selected
+    return dict(mapping, children=children, columns={
+        col: source for col, source in mapping['columns'].items()
+        if col in columns or (col == 'id' and children) or source == '$parent'
+        or (source == '$parameters_id' and 'parameters' in selection)
+    })
+
+# Lookup tables of the normalized code output and their columns
+CODE_TABLES = {
+    'code_systems': ['id', 'system'],
+    'codes': ['id', 'code_system_id', 'code']
+}
+
+def normalize_code_mapping(mapping):
+    """Return a mapping whose code and system column pairs are replaced by one codes lookup column"""
+    columns = {}
+    for col, source in mapping['columns'].items():
+        # 'code' pairs with 'system', and 'race_code' with 'race_system'
+        system_col = col[:-4] + 'system' if col == 'code' or col.endswith('_code') else None
+        if system_col in mapping['columns']:
+            columns[f"{col}_id"] = {'code': source, 'system': mapping['columns'][system_col]}
+        elif not (col.endswith('system') and col[:-6] + 'code' in mapping['columns']):
+            columns[col] = source
+    
+    children = [normalize_code_mapping(child) for child in mapping.get('children', [])]
+    return dict(mapping, columns=columns, children=children)
+
+def compile_resource_mapping(mapping, functions=None, interned=()):
+    """Generate and compile the extractor function(resource, parameters_id, data, counter) of a mapping"""
+    lines = ['def extract(resource, parameters_id, data, counter):']
+    
+    # Functions and objects used by the generated code: 'strings' shares the values of the
+    # interned columns, and 'code_id' looks up normalized codes
+    namespace = {'strings': {}}
+    namespace.update(functions or {})
+    table = mapping['table']
+    emit_mapping(mapping, 'resource', None, 1, lines, namespace, itertools.count(),
+                 f"data[{table!r}].append", f"counter[{table!r}]", interned)
+    
+    exec(compile('\n'.join(lines), f"<mapping {table}>", 'exec'), namespace)
+    return namespace['extract']
+
+def emit_path_prefix(steps, element, depth, lines, prefix_vars, names):
+    """Emit code resolving path steps once per element and return the variable holding the result (or None)"""
+    key = (element, tuple(steps))
+    if key in prefix_vars:
+        return prefix_vars[key]
+    
+    pad = '    ' * depth
+    var = f"p{next(names)}"
+    lines.append(f"{pad}{var} = {element}.get({steps[0]!r})")
+    for step in steps[1:]:
+        if isinstance(step, int):
+            lines.append(f"{pad}{var} = {var}[{step}] if {var} else None")
+        else:
+            lines.append(f"{pad}{var} = {var}.get({step!r}) if {var} is not None else None")
+    
+    prefix_vars[key] = var
+    return var
+
+def emit_mapping(mapping, element, parent_id, depth, lines, namespace, names, append, next_id, interned=()):
+    """Emit the code appending one row tuple for element, followed by the rows of its children"""
+    pad = '    ' * depth
+    table = mapping['table']
+    row_id = f"id{depth}"
+    
+    # Path prefixes already resolved for this element, shared by columns such as code and system
+    prefix_vars = {}
+    
+    # Values computed once per element by the mapping's functions
+    derived = {}
+    for name, function in mapping.get('derived', {}).items():
+        function_name = f"derive{next(names)}"
+        namespace[function_name] = function
+        derived[name] = f"d{next(names)}"
+        lines.append(f"{pad}{derived[name]} = {function_name}({element})")
+    
+    def expression(source):
+        transform = None
+        if isinstance(source, tuple):
+            source, transform = source
+        
+        if isinstance(source, dict):
+            # Normalized codes: the pair is looked up (and added when new) by the converter's code_id
+            expr = f"code_id({expression(source['code'])}, {expression(source['system'])})"
+        elif callable(source):
+            name = f"f{next(names)}"
+            namespace[name] = source
+            expr = f"{name}({element})"
+        elif source == '$parameters_id':
+            expr = 'parameters_id'
+        elif source == '$parent':
+            expr = parent_id
+        elif source == '$counter':
+            lines.append(f"{pad}{row_id} = {next_id}")
+            lines.append(f"{pad}{next_id} = {row_id} + 1")
+            expr = row_id
+        elif '[*].' in source:
+            list_path, key = source.split('[*].')
+            items = emit_path_prefix(parse_mapping_path(list_path), element, depth, lines, prefix_vars, names)
+            expr = f"v{next(names)}"
+            lines.append(f"{pad}{expr} = ''")
+            lines.append(f"{pad}for e in {items} or ():")
+            lines.append(f"{pad}    if e.get({key!r}):")
+            lines.append(f"{pad}        {expr} = e[{key!r}]")
+            lines.append(f"{pad}        break")
+        else:
+            base = element
+            if source.startswith('@'):
+                name, _, source = source[1:].partition('.')
+                base = derived[name]
+            
+            *prefix, last = parse_mapping_path(source)
+            if not prefix:
+                expr = f"{base}.get({last!r}, '')"
+            else:
+                var = emit_path_prefix(prefix, base, depth, lines, prefix_vars, names)
+                expr = f"({var}.get({last!r}, '') if {var} is not None else '')"
+        
+        if transform is not None:
+            expr = MAPPING_TRANSFORMS[transform].format(expr)
+        return expr
+    
+    values = []
+    for col, source in mapping['columns'].items():
+        expr = expression(source)
+        
+        # Repeated values such as code system URLs share one string object across rows
+        if col in interned and not isinstance(source, dict):
+            value = f"v{next(names)}"
+            lines.append(f"{pad}{value} = {expr}")
+            expr = f"strings.setdefault({value}, {value})"
+        
+        # Children reference the row's id, so keep it in a variable
+        if col == 'id' and expr != row_id:
+            lines.append(f"{pad}{row_id} = {expr}")
+            expr = row_id
+        values.append(expr)
+    
+    # Rows are tuples in column order, ready for the table writers
+    lines.append(f"{pad}{append}(({', '.join(values)},))")
+    
+    for child in mapping.get('children', []):
+        items = emit_path_prefix(parse_mapping_path(child['each']), element, depth, lines, prefix_vars, names)
+        
+        # Keep the child table's append method and ID counter in locals for the loop
+        child_table = child['table']
+        child_append = f"append{next(names)}"
+        child_next_id = f"next{next(names)}"
+        lines.append(f"{pad}{child_append} = data[{child_table!r}].append")
+        lines.append(f"{pad}{child_next_id} = counter[{child_table!r}]")
+        
+        child_element = f"e{depth}"
+        lines.append(f"{pad}for {child_element} in {items} or ():")
+        emit_mapping(child, child_element, row_id, depth + 1, lines, namespace, names, child_append, child_next_id,
+                     interned)
+        lines.append(f"{pad}counter[{child_table!r}] = {child_next_id}")
 
 class FHIRToQuotedPipeDelimitedNoHeader:
-    def __init__(self, input_file, output_dir):
+    def __init__(self, input_file, output_dir, streaming=False, batch_size=10000, workers=1, decoder='json',
+                 database=None, paramstyle=None, output_format='csv', checkpoint=False, resource_mappings=None,
+                 select=None, instrument=False, progress_interval=None, progress_callback=None, profile_path=None,
+                 reader='auto', export_threads=1, compression=None, part_rows=None, patient_index=None,
+                 patient_key='id', normalize_codes=False, pipeline=False, pipeline_depth=8, typed_schema=True,
+                 record_cache=None, record_cache_size=1024 ** 3):
         self.input_file = input_file
         self.output_dir = output_dir
         
+        # Resource types to flatten and the tables they map to (see RESOURCE_MAPPINGS)
+        self.resource_mappings = RESOURCE_MAPPINGS if resource_mappings is None else resource_mappings
+        
+        # With checkpointing, progress is recorded in a manifest after every flushed
+        # batch so an interrupted or extended conversion continues where it stopped
+        self.checkpoint = checkpoint
+        self.checkpoint_path = os.path.join(output_dir, 'checkpoint.json')
+        
+        # Input offset and rows written where a resumed run starts, for its progress reports
+        self.resume_offset = 0
+        self.resume_rows = 0
+        
+        # 'csv' writes quoted pipe-delimited files, 'parquet' one typed Parquet file per table
+        if output_format not in ('csv', 'parquet'):
+            raise ValueError(f"Unknown output format: {output_format}")
+        if output_format == 'parquet' and pyarrow is None:
+            raise ImportError("Parquet output requires pyarrow")
+        self.output_format = output_format
+        
+        # Optional DB-API connection; streamed batches are inserted into it instead of the table files
+        self.database = database
+        self.paramstyle = paramstyle
+        self.database_state = None
+        
+        # Fall back to the stdlib decoder when an optional library is missing
+        if decoder not in JSON_DECODERS:
+            if decoder != 'orjson':
+                raise ValueError(f"Unknown JSON decoder: {decoder}")
+            print(f"JSON decoder '{decoder}' is not installed, using 'json' instead")
+            decoder = 'json'
+        self.decoder = decoder
+        self.loads = JSON_DECODERS[decoder][1]
+        
+        # In streaming mode rows are written to the table files in batches of
+        # roughly batch_size rows instead of being held until export
+        self.streaming = streaming
+        self.batch_size = batch_size
+        
+        # With more than one worker the input is split into byte-range shards
+        # that are converted in a process pool and merged afterwards
+        self.workers = workers
+        
+        # The pipeline mode reads ahead on a thread, flattens chunks of lines in the process pool
+        # when there are several workers, and writes behind on a thread; each stage holds at
+        # most pipeline_depth chunks or batches, and rows keep their input order
+        if pipeline and checkpoint:
+            raise ValueError("The pipeline mode cannot be checkpointed")
+        self.pipeline = pipeline
+        self.pipeline_depth = pipeline_depth
+        self.write_behind = None
+        self.pending_writes = deque()
+        
+        # How the input is read: plain file, memory map, or a decompressing stream
+        if reader not in INPUT_READERS:
+            raise ValueError(f"Unknown input reader: {reader}")
+        if reader == 'zstd' and zstandard is None:
+            raise ImportError("zstd input requires zstandard")
+        self.reader = reader
+        
+        # Table files can be written by several threads at once, compressed, and
+        # split into part files of at most part_rows rows
+        if compression not in TABLE_COMPRESSION_EXTENSIONS:
+            raise ValueError(f"Unknown table compression: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            raise ImportError("zstd table files require zstandard")
+        if checkpoint and (compression or part_rows):
+            raise ValueError("Checkpointed runs cannot compress or split table files")
+        self.export_threads = export_threads
+        self.compression = compression
+        self.part_rows = part_rows
+        self.export_pool = None
+        
+        # Parquet column types by column name; unlisted columns are plain strings
+        self.parquet_types = {
+            'eob_item_id': 'int',
+            'sequence': 'int',
+            'amount_value': 'decimal',
+            'quantity_value': 'decimal',
+            'daysSupply_value': 'decimal',
+            'valueQuantity_value': 'decimal',
+            'birthDate': 'date',
+            'servicedDate': 'date',
+        }
+        
+        # Low-cardinality columns stored with dictionary encoding in Parquet
+        self.dictionary_columns = {
+            'resourceType', 'gender', 'race_code', 'race_system', 'ethnicity_code', 'ethnicity_system',
+            'system', 'use', 'state', 'type', 'status', 'outcome', 'productOrService_system',
+            'category_code', 'category_system', 'amount_currency', 'name', 'value_type',
+            'clinical_status', 'class_code', 'class_system', 'type_code', 'type_system', 'medication_system', 'quantity_unit'
+        }
+        
+        # Referencing column -> referenced table, used for indexes and foreign keys
+        self.foreign_keys = {
+            'parameters_id': 'parameters',
+            'patient_id': 'patients',
+            'claim_id': 'claims',
+            'eob_id': 'explanation_of_benefits',
+            'eob_item_id': 'eob_items'
+        }
+        
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
-        # Initialize tables with their columns
-        self.tables = {
-            'parameters': ['id', 'resourceType'],
-            'patients': ['id', 'parameters_id', 'gender', 'birthDate', 'race_code', 'race_system', 'ethnicity_code', 'ethnicity_system'],
-            'patient_identifiers': ['id', 'patient_id', 'system', 'value', 'use'],
-            'patient_names': ['id', 'patient_id', 'family', 'given'],
-            'patient_telecom': ['id', 'patient_id', 'system', 'value'],
-            'patient_addresses': ['id', 'patient_id', 'line', 'city', 'state', 'postalCode'],
-            'claims': ['id', 'parameters_id', 'type', 'patient_id', 'servicedDate'],
-            'claim_diagnoses': ['id', 'claim_id', 'sequence', 'code', 'system'],
-            'claim_items': ['id', 'claim_id', 'sequence', 'productOrService_code', 'productOrService_system', 'servicedDate'],
-            'explanation_of_benefits': ['id', 'parameters_id', 'status', 'type', 'patient_id', 'outcome'],
-            'eob_diagnoses': ['id', 'eob_id', 'sequence', 'code', 'system'],
-            'eob_items': ['id', 'eob_id', 'sequence', 'productOrService_code', 'productOrService_system', 'servicedDate'],
-            'eob_adjudications': ['id', 'eob_item_id', 'category_code', 'category_system', 'amount_value', 'amount_currency'],
-            'parameter_values': ['id', 'parameters_id', 'name', 'value_type', 'value']
+        # Initialize tables with their columns, and the columns holding IDs
+        # generated from self.counter mapped to the counter they use
+        self.tables = {'parameters': ['id', 'resourceType']}
+        self.surrogate_ids = {}
+        for mapping in self.resource_mappings.values():
+            for table, columns, surrogate_ids in mapping_tables(mapping):
+                self.tables[table] = columns
+                if surrogate_ids:
+                    self.surrogate_ids[table] = surrogate_ids
+        self.tables['parameter_values'] = ['id', 'parameters_id', 'name', 'value_type', 'value']
+        self.surrogate_ids['parameter_values'] = {'id': 'parameter_values'}
+        
+        # A selection of tables ('patients') and columns ('parameter_values.name') limits the
+        # output to them; resources without selected tables are then skipped unparsed
+        self.select = select
+        self.positions = {'parameters': None, 'parameter_values': None}
+        if select is not None:
+            self.project_tables(parse_selection(select))
+        
+        # Normalized codes replace code and system column pairs with IDs into the
+        # code_systems and codes lookup tables, numbered in the order codes are first seen
+        self.normalize_codes = normalize_codes
+        self.code_ids = {}
+        self.code_system_ids = {}
+        if normalize_codes:
+            if checkpoint or workers > 1 or patient_index is not None:
+                raise ValueError("Normalized codes cannot be combined with checkpoints, shard workers or the patient index")
+            self.normalize_code_tables()
+        
+        # Values of low-cardinality and code columns repeat on many rows, so one string
+        # object per distinct value is kept and shared by all rows
+        self.strings = {}
+        self.interned_columns = self.dictionary_columns | {
+            col for columns in self.tables.values() for col in columns if col == 'code' or col.endswith('_code')
+        }
+        
+        # Compile each mapping once into a specialized extractor function
+        functions = {'strings': self.strings, 'code_id': self.code_id}
+        self.extractors = {
+            resource_type: compile_resource_mapping(mapping, functions, self.interned_columns)
+            for resource_type, mapping in self.resource_mappings.items()
+        }
+        
+        # With a patient index, the rows of a patient are only emitted when it is new or its
+        # content changed since it was last exported, in this run or an earlier one
+        self.patient_index = None
+        self.patients_skipped = 0
+        
+        # Resource id of a skipped patient -> id of the patient rows exported for it; keyed by
+        # original-id the two differ, so the patient_id of the rows referencing it is rewritten
+        self.patient_aliases = {}
+        if patient_index is not None:
+            if patient_key not in PATIENT_KEYS:
+                raise ValueError(f"Unknown patient key: {patient_key}")
+            if checkpoint or workers > 1:
+                raise ValueError("The patient index cannot be combined with checkpoints or shard workers")
+            if 'Patient' in self.extractors:
+                self.open_patient_index(patient_index, patient_key)
+        
+        # With a record cache, the rows flattened from each line are kept across runs keyed by a
+        # hash of the line, so unchanged lines are neither decoded nor flattened again
+        self.record_cache = None
+        self.record_cache_size = record_cache_size
+        self.record_cache_hits = 0
+        self.record_cache_misses = 0
+        self.record_cache_writes = 0
+        if record_cache is not None:
+            # Shard and pipeline workers flatten without the cache; normalized codes and the
+            # patient index depend on the records seen before, not on the line alone
+            if workers > 1 or normalize_codes or patient_index is not None:
+                raise ValueError("The record cache cannot be combined with workers, normalized codes or the patient index")
+            self.open_record_cache(record_cache)
+        
+        # Type and length statistics of the written rows, from which the schemas get typed
+        # columns, primary keys on unique natural IDs and foreign keys referencing them.
+        # Resumed runs restore the statistics of earlier runs from the checkpoint
+        self.typed_schema = typed_schema
+        self.column_stats = {
+            table: {col: {'length': 0, 'kinds': set()} for col in columns}
+            for table, columns in self.tables.items()
+        }
+        
+        # Digests of the natural IDs seen per table while they are unique (None once one repeats)
+        self.unique_ids = {
+            table: set() for table, columns in self.tables.items()
+            if 'id' in columns and 'id' not in self.surrogate_ids.get(table, {})
         }
         
-        # Initialize data dictionaries
+        # Digests of the values of the columns referencing those tables; a foreign key is only declared
+        # when the output holds every referenced ID, which it does not once the patient index skips patients
+        self.referenced_ids = {
+            (table, col): set() for table, columns in self.tables.items() for col in columns
+            if self.foreign_keys.get(col) in self.unique_ids
+        }
+        
+        # Buffered rows per table, as tuples in column order
         self.data = {table: [] for table in self.tables}
         
         # Counter for generating IDs
         self.counter = {table: 1 for table in self.tables}
+        
+        # Rows already flushed to disk per table (streaming mode)
+        self.rows_written = {table: 0 for table in self.tables}
+        
+        # Open file handles per table (streaming mode), and the part number and rows of
+        # the current part file of each table when tables are split into parts
+        self.files = {}
+        self.parts = {}
+        self.part_sizes = {}
+        
+        # Open Parquet writers per table
+        self.parquet_writers = {}
+        
+        # Instrumentation wraps this instance's methods, so the plain code paths stay untouched when it is off
+        self.progress_interval = progress_interval
+        self.progress_callback = progress_callback
+        self.profile_path = profile_path
+        self.instrumented = instrument or progress_interval is not None or profile_path is not None
+        if self.instrumented:
+            self.instrument()
+    
+    def instrument(self):
+        """Time the conversion phases and resource types of this instance and count its input progress"""
+        self.phase_times = {'read': 0.0, 'decode': 0.0, 'flatten': 0.0, 'export': 0.0, 'schema': 0.0}
+        self.resource_times = {}
+        self.resource_counts = {}
+        self.active_phase = None
+        self.progress = {'lines': 0, 'bytes': 0}
+        self.started = None
+        self.next_progress = None
+        self.profiler = cProfile.Profile() if self.profile_path else None
+        
+        self.loads = self.timed('decode', self.loads)
+        self.process_record = self.timed('flatten', self.process_record)
+        for method in ['flush_rows', 'export_to_quoted_pipe_delimited_no_header', 'export_to_database', 'export_to_parquet']:
+            setattr(self, method, self.timed('export', getattr(self, method)))
+        for method in ['generate_schema_sql', 'generate_microsoft_access_sql', 'generate_field_maps']:
+            setattr(self, method, self.timed('schema', getattr(self, method)))
+        self.extractors = {
+            resource_type: self.timed_resource(resource_type, extractor)
+            for resource_type, extractor in self.extractors.items()
+        }
+        
+        process_file = self.process_file
+        process_line = self.process_line
+        
+        def timed_process_file():
+            self.started = time.perf_counter()
+            if self.progress_interval is not None:
+                self.next_progress = self.started + self.progress_interval
+            if self.profiler is not None:
+                self.profiler.enable()
+            
+            # Time not spent decoding, flattening or flushing goes to reading the input
+            accounted = sum(self.phase_times.values())
+            process_file()
+            self.phase_times['read'] += time.perf_counter() - self.started - (sum(self.phase_times.values()) - accounted)
+        
+        def counted_process_line(line_number, line, report_invalid):
+            process_line(line_number, line, report_invalid)
+            self.advance_progress(1, len(line))
+        
+        self.process_file = timed_process_file
+        self.process_line = counted_process_line
+    
+    def timed(self, phase, function):
+        """Wrap function so its run time counts towards phase, unless it runs inside another timed phase"""
+        def wrapper(*args, **kwargs):
+            if self.active_phase is not None:
+                return function(*args, **kwargs)
+            self.active_phase = phase
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.phase_times[phase] += time.perf_counter() - start
+                self.active_phase = None
+        return wrapper
+    
+    def timed_resource(self, resource_type, extractor):
+        """Wrap a resource extractor so its run time and calls are counted per resource type"""
+        self.resource_times[resource_type] = 0.0
+        self.resource_counts[resource_type] = 0
+        
+        def wrapper(resource, parameters_id, data, counter):
+            start = time.perf_counter()
+            extractor(resource, parameters_id, data, counter)
+            self.resource_times[resource_type] += time.perf_counter() - start
+            self.resource_counts[resource_type] += 1
+        return wrapper
+    
+    def advance_progress(self, lines, size):
+        """Count processed input and report progress when the interval has passed"""
+        self.progress['lines'] += lines
+        self.progress['bytes'] += size
+        if self.next_progress is not None and time.perf_counter() >= self.next_progress:
+            self.report_progress()
+            self.next_progress = time.perf_counter() + self.progress_interval
+    
+    def report_progress(self):
+        """Send the input progress and throughput so far to the progress callback, or log it"""
+        elapsed = time.perf_counter() - self.started
+        
+        # Decompressed bytes cannot be compared with the compressed file size
+        total_bytes = None if self.input_format() in COMPRESSION_MAGIC.values() else os.path.getsize(self.input_file)
+        rows = sum(self.row_count(table) for table in self.tables)
+        
+        # A resumed run starts reading at its checkpoint, so its rate covers the bytes after it
+        # and its ETA the bytes still left; bytes is the position in the input file
+        rate = self.progress['bytes'] / elapsed if elapsed else 0.0
+        position = self.resume_offset + self.progress['bytes']
+        progress = {
+            'lines': self.progress['lines'],
+            'bytes': position,
+            'resumed_at': self.resume_offset,
+            'total_bytes': total_bytes,
+            'rows': rows,
+            'elapsed': elapsed,
+            'rows_per_s': (rows - self.resume_rows) / elapsed if elapsed else 0.0,
+            'mb_per_s': rate / (1024 * 1024),
+            'eta': (total_bytes - position) / rate if rate and total_bytes is not None else None
+        }
+        
+        if self.progress_callback is not None:
+            self.progress_callback(progress)
+            return
+        eta = f"{progress['eta']:.0f}s" if progress['eta'] is not None else 'unknown'
+        if total_bytes is None:
+            done = f"{self.progress['bytes'] / (1024 * 1024):.1f} MB decompressed"
+        else:
+            done = f"{100 * progress['bytes'] / max(total_bytes, 1):.1f}% of {total_bytes / (1024 * 1024):.1f} MB"
+        logger.info(f"{self.input_file}: {progress['lines']} lines, {done}, {rows} rows, "
+                    f"{progress['rows_per_s']:.0f} rows/s, {progress['mb_per_s']:.2f} MB/s, ETA {eta}")
+    
+    def report_telemetry(self):
+        """Log the phase, resource type and table statistics, dump the profile, and return the statistics"""
+        if not self.instrumented:
+            return None
+        
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile_path)
+            report = io.StringIO()
+            pstats.Stats(self.profiler, stream=report).sort_stats('cumulative').print_stats(20)
+            logger.info(f"Profile saved to {self.profile_path}\n{report.getvalue()}")
+        
+        telemetry = {
+            'lines': self.progress['lines'],
+            'bytes': self.progress['bytes'],
+            'phases': dict(self.phase_times),
+            'resource_types': {
+                resource_type: {'count': self.resource_counts[resource_type], 'seconds': seconds}
+                for resource_type, seconds in self.resource_times.items()
+            },
+            'rows': {table: self.row_count(table) for table in self.tables}
+        }
+        
+        logger.info(f"{self.input_file}: time per phase")
+        for phase, seconds in telemetry['phases'].items():
+            logger.info(f"  {phase:24} {seconds:9.3f}s")
+        logger.info("Flattening time per resource type")
+        for resource_type, stats in telemetry['resource_types'].items():
+            if stats['count']:
+                logger.info(f"  {resource_type:24} {stats['seconds']:9.3f}s {stats['count']:9} resources")
+        logger.info("Rows per table")
+        for table, count in telemetry['rows'].items():
+            if count:
+                logger.info(f"  {table:24} {count:9}")
+        return telemetry
+    
+    def open_patient_index(self, path, key):
+        """Open the patient index database and route Patient resources through it"""
+        self.patient_index = sqlite3.connect(path, timeout=60)
+        
+        # Batch conversions of several measure files share the index, so let readers run during writes
+        self.patient_index.execute("PRAGMA journal_mode=WAL")
+        self.patient_index.execute(
+            "CREATE TABLE IF NOT EXISTS patient_index (key TEXT PRIMARY KEY, hash TEXT NOT NULL, patient_id TEXT NOT NULL)"
+        )
+        self.patient_index.commit()
+        
+        self.extractors['Patient'] = self.indexed_patient_extractor(self.extractors['Patient'], key)
+    
+    def indexed_patient_extractor(self, extractor, key):
+        """Wrap the Patient extractor so unchanged patients already in the index emit no rows"""
+        # Keyed by original-id, the same member has a different resource id in each measure file
+        skip = ('id',) if key == 'original-id' else ()
+        content = list(mapping_content_positions(self.resource_mappings['Patient'], skip))
+        
+        def wrapper(resource, parameters_id, data, counter):
+            patient_key = resource.get('id', '') if key == 'id' else patient_original_id(resource)
+            if not patient_key:
+                extractor(resource, parameters_id, data, counter)
+                return
+            
+            # Flatten into scratch tables, so the rows can be dropped with the IDs they took
+            rows = {table: [] for table, positions in content}
+            ids = {table: counter[table] for table in rows}
+            extractor(resource, parameters_id, rows, counter)
+            
+            # Hash only the content columns; parameters and surrogate IDs differ between records
+            digest = hashlib.sha256(repr([
+                [tuple(row[position] for position in positions) for row in rows[table]]
+                for table, positions in content
+            ]).encode('utf-8')).hexdigest()
+            
+            patient_id = resource.get('id', '')
+            indexed = self.patient_index.execute(
+                "SELECT hash, patient_id FROM patient_index WHERE key = ?", (patient_key,)
+            ).fetchone()
+            if indexed is not None and indexed[0] == digest:
+                counter.update(ids)
+                self.patients_skipped += 1
+                if indexed[1] != patient_id:
+                    self.patient_aliases[patient_id] = indexed[1]
+                return
+            
+            self.patient_aliases.pop(patient_id, None)
+            self.patient_index.execute(
+                "INSERT OR REPLACE INTO patient_index (key, hash, patient_id) VALUES (?, ?, ?)",
+                (patient_key, digest, patient_id)
+            )
+            for table, table_rows in rows.items():
+                data[table].extend(table_rows)
+        return wrapper
+    
+    def resolve_patient_aliases(self, batch):
+        """Point the patient_id of a batch of rows per table at the exported rows of skipped patients"""
+        if not self.patient_aliases:
+            return
+        aliases = self.patient_aliases
+        for table, rows in batch.items():
+            if 'patient_id' not in self.tables[table]:
+                continue
+            position = self.tables[table].index('patient_id')
+            batch[table] = [
+                row if row[position] not in aliases else row[:position] + (aliases[row[position]],) + row[position + 1:]
+                for row in rows
+            ]
+    
+    def close_patient_index(self):
+        """Commit the patient index, report the patients it skipped and close it"""
+        if self.patient_index is None:
+            return
+        self.patient_index.commit()
+        self.patient_index.close()
+        self.patient_index = None
+        print(f"Skipped {self.patients_skipped} unchanged patients already in the patient index")
+    
+    def open_record_cache(self, path):
+        """Open the record cache database, clearing it when it was filled by another converter version"""
+        self.record_cache = sqlite3.connect(path, timeout=60)
+        
+        # Batch conversions of several measure files share the cache; evicted pages are given back
+        self.record_cache.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.record_cache.execute("PRAGMA journal_mode=WAL")
+        self.record_cache.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.record_cache.execute(
+            "CREATE TABLE IF NOT EXISTS records (key BLOB PRIMARY KEY, rows BLOB NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL)"
+        )
+        
+        settings = dict(self.record_cache.execute("SELECT name, value FROM settings"))
+        version = self.record_cache_version()
+        if settings.get('version') != version:
+            if settings:
+                print(f"Clearing the record cache {path}, it was filled by another converter version or mapping")
+            self.record_cache.execute("DELETE FROM records")
+        
+        # Runs are numbered so eviction drops the records least recently used
+        self.record_cache_run = int(settings.get('run', 0)) + 1
+        self.record_cache.executemany(
+            "INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)",
+            [('version', version), ('run', str(self.record_cache_run))]
+        )
+        self.record_cache.commit()
+    
+    def record_cache_version(self):
+        """Return a digest of everything that shapes the cached rows: this converter's code, the mappings and the selection"""
+        with open(__file__, 'rb') as f:
+            source = f.read()
+        # The decoders all produce the same rows, so switching between them keeps the cache. Functions
+        # in custom mappings count by name, their repr holds a different address on every run
+        shape = json.dumps(
+            [self.resource_mappings, self.tables, self.surrogate_ids, self.positions],
+            default=lambda value: getattr(value, '__qualname__', repr(value))
+        )
+        return hashlib.sha256(source + shape.encode('utf-8')).hexdigest()
+    
+    def process_cached_line(self, line_number, line, report_invalid):
+        """Add the rows of a line from the record cache, flattening and caching them when the line is new"""
+        key = hashlib.blake2b((line.encode('utf-8') if isinstance(line, str) else line).rstrip(), digest_size=16).digest()
+        cached = self.record_cache.execute("SELECT rows FROM records WHERE key = ?", (key,)).fetchone()
+        
+        if cached is not None:
+            entry = pickle.loads(cached[0])
+            self.record_cache.execute("UPDATE records SET used = ? WHERE key = ?", (self.record_cache_run, key))
+            self.record_cache_hits += 1
+        else:
+            try:
+                record = self.loads(line) if self.select is None else self.scan_record(line)
+            except ValueError as e:  # Invalid lines are not cached, so they are reported on every run
+                report_invalid(line_number, e)
+                return
+            
+            # Flatten into scratch tables numbered from 1, the form the rows are cached in
+            data, counter = self.data, self.counter
+            self.data = {table: [] for table in self.tables}
+            self.counter = {table: 1 for table in self.tables}
+            try:
+                self.process_record(record)
+                entry = {
+                    'data': {table: rows for table, rows in self.data.items() if rows},
+                    'counter': {table: count for table, count in self.counter.items() if count > 1}
+                }
+            finally:
+                self.data, self.counter = data, counter
+            
+            rows = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+            self.record_cache.execute(
+                "INSERT OR REPLACE INTO records (key, rows, size, used) VALUES (?, ?, ?, ?)",
+                (key, rows, len(rows), self.record_cache_run)
+            )
+            self.record_cache_misses += 1
+        
+        # Hits and misses take the same path, so the IDs follow on exactly as in a run without the cache
+        self.add_numbered_rows(entry['data'], entry['counter'])
+        
+        # Commit regularly so other conversions sharing the cache are not locked out
+        self.record_cache_writes += 1
+        if self.record_cache_writes >= self.batch_size:
+            self.record_cache.commit()
+            self.record_cache_writes = 0
+    
+    def close_record_cache(self):
+        """Evict the least recently used records beyond the cache size, report the cache use and close it"""
+        if self.record_cache is None:
+            return
+        evicted = self.record_cache.execute(
+            "DELETE FROM records WHERE key IN ("
+            "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY used DESC, rowid DESC) AS total FROM records) "
+            "WHERE total > ?)",
+            (self.record_cache_size,)
+        ).rowcount
+        self.record_cache.commit()
+        self.record_cache.executescript("PRAGMA incremental_vacuum")  # Run to completion, execute frees one page
+        self.record_cache.close()
+        self.record_cache = None
+        print(f"Record cache: {self.record_cache_hits} lines reused, {self.record_cache_misses} flattened, "
+              f"{evicted} evicted")
+    
+    def normalize_code_tables(self):
+        """Replace the code and system column pairs of the mappings and add the code lookup tables"""
+        self.resource_mappings = {
+            resource_type: normalize_code_mapping(mapping)
+            for resource_type, mapping in self.resource_mappings.items()
+        }
+        
+        # The built-in tables keep their place, unless a selection left them out
+        tables = {table: columns for table, columns in self.tables.items() if table == 'parameters'}
+        for mapping in self.resource_mappings.values():
+            for table, columns, surrogate_ids in mapping_tables(mapping):
+                tables[table] = columns
+                if surrogate_ids:
+                    self.surrogate_ids[table] = surrogate_ids
+                for col, counter in surrogate_ids.items():
+                    if counter == 'codes':
+                        self.foreign_keys[col] = 'codes'
+        if 'parameter_values' in self.tables:
+            tables['parameter_values'] = self.tables['parameter_values']
+        tables.update(CODE_TABLES)
+        self.tables = tables
+        
+        self.surrogate_ids['code_systems'] = {'id': 'code_systems'}
+        self.surrogate_ids['codes'] = {'id': 'codes', 'code_system_id': 'code_systems'}
+        self.foreign_keys['code_system_id'] = 'code_systems'
+    
+    def code_id(self, code, system):
+        """Return the ID of a code in the codes table, adding the code and its system when new"""
+        if code == '' and system == '':
+            return None
+        
+        code_id = self.code_ids.get((code, system))
+        if code_id is None:
+            system_id = self.code_system_ids.get(system) if system != '' else None
+            if system_id is None and system != '':
+                system_id = self.code_system_ids[system] = self.counter['code_systems']
+                self.counter['code_systems'] += 1
+                self.data['code_systems'].append((system_id, system))
+            
+            code_id = self.code_ids[(code, system)] = self.counter['codes']
+            self.counter['codes'] += 1
+            self.data['codes'].append((code_id, system_id, code))
+        return code_id
+    
+    def project_tables(self, selection):
+        """Reduce the tables, mappings and surrogate IDs to a selection of tables and columns"""
+        for table, columns in selection.items():
+            if table not in self.tables:
+                raise ValueError(f"Unknown table: {table}")
+            for col in columns or []:
+                if col not in self.tables[table]:
+                    raise ValueError(f"Unknown column: {table}.{col}")
+        
+        self.resource_mappings = {
+            resource_type: projected
+            for resource_type, projected in (
+                (resource_type, project_mapping(mapping, selection))
+                for resource_type, mapping in self.resource_mappings.items()
+            )
+            if projected is not None
+        }
+        
+        tables = {'parameters': self.tables['parameters']}
+        for mapping in self.resource_mappings.values():
+            for table, columns, surrogate_ids in mapping_tables(mapping):
+                tables[table] = columns
+        tables['parameter_values'] = self.tables['parameter_values']
+        
+        # The built-in tables build full rows, cut down to these column positions. Like
+        # the mapped tables they keep the keys joining them to the other selected tables
+        keys = {
+            'parameters': ['id'] if len(selection) > 1 else [],
+            'parameter_values': ['parameters_id'] if 'parameters' in selection else []
+        }
+        self.tables = {}
+        for table, columns in tables.items():
+            if table in selection and table in ('parameters', 'parameter_values'):
+                self.tables[table] = [
+                    col for col in columns if selection[table] is None or col in selection[table] or col in keys[table]
+                ]
+                if self.tables[table] != columns:
+                    self.positions[table] = [columns.index(col) for col in self.tables[table]]
+            elif table not in ('parameters', 'parameter_values'):
+                self.tables[table] = columns
+        
+        self.surrogate_ids = {
+            table: {col: counter for col, counter in surrogate_ids.items() if col in self.tables[table]}
+            for table, surrogate_ids in self.surrogate_ids.items()
+            if table in self.tables
+        }
+    
+    def input_format(self):
+        """Return the reader of the input file, detecting compression when the reader is 'auto'"""
+        if self.reader != 'auto':
+            return self.reader
+        return detect_input_format(self.input_file)
     
     def process_file(self):
         """Process the input NDJSON file"""
-        with open(self.input_file, 'r') as f:
-            for line_number, line in enumerate(f, start=1):
-                if line.strip():  # Skip empty lines
-                    try:
-                        record = json.loads(line)
-                        self.process_record(record)
-                    except json.JSONDecodeError as e:
-                        print(f"Skipping invalid JSON at line {line_number}: {e}")
+        # Resumed runs append to the table files of earlier runs; any other run replaces them
+        if self.database is None and not (self.checkpoint and os.path.exists(self.checkpoint_path)):
+            self.remove_table_files()
+        
+        input_format = self.input_format()
+        if input_format in COMPRESSION_MAGIC.values():
+            # Decompressed streams have no byte offsets to shard or resume at; the pipeline
+            # mode hands its workers chunks of lines instead
+            if self.checkpoint or (self.workers > 1 and not self.pipeline):
+                raise ValueError(f"{input_format} input cannot be checkpointed or split across workers")
+            
+            stream = open_compressed(self.input_file, input_format)
+            if JSON_DECODERS[self.decoder][0]:
+                with stream:
+                    self.process_lines(strip_bom(stream))
+            else:
+                # utf-8-sig drops the byte order mark the measure files start with
+                with io.TextIOWrapper(stream, encoding='utf-8-sig') as f:
+                    self.process_lines(f)
+            return
+        
+        if self.checkpoint:
+            if self.workers > 1 or self.database is not None or self.output_format != 'csv':
+                raise ValueError("Checkpointing only supports serial quoted pipe-delimited output")
+            self.process_file_resumable()
+            return
+        
+        if self.workers > 1 and not self.pipeline:
+            if self.database is not None or self.output_format != 'csv':
+                raise ValueError("Parallel conversion only supports quoted pipe-delimited output")
+            self.process_file_parallel()
+            return
+        
+        reads_bytes = JSON_DECODERS[self.decoder][0]
+        if input_format == 'mmap':
+            lines = read_mapped_range(self.input_file, 0, os.path.getsize(self.input_file))
+            # Text decoders get the same str lines as when reading the file in text mode
+            self.process_lines(lines if reads_bytes else (line.decode('utf-8') for line in lines))
+            return
+        
+        if reads_bytes:
+            self.process_lines(read_byte_range(self.input_file, 0, os.path.getsize(self.input_file)))
+            return
+        
+        # utf-8-sig drops the byte order mark the measure files start with
+        with open(self.input_file, 'r', encoding='utf-8-sig') as f:
+            self.process_lines(f)
+    
+    def process_lines(self, lines, report_invalid=None):
+        """Process NDJSON lines and return the number of lines read"""
+        if report_invalid is None:
+            report_invalid = self.report_invalid_json
+        if self.pipeline:
+            # Rows are written behind, so the table files are always written in streaming mode
+            self.streaming = True
+            chunks = prefetch_chunks(lines, PIPELINE_CHUNK_SIZE, self.pipeline_depth)
+            if self.workers > 1:
+                return self.process_chunks(chunks, report_invalid)
+            lines = itertools.chain.from_iterable(chunks)
+        
+        line_number = 0
+        for line_number, line in enumerate(lines, start=1):
+            if line.strip():  # Skip empty lines
+                self.process_line(line_number, line, report_invalid)
+                
+                # Only flush between records so a record's rows are complete
+                if self.streaming and self.buffered_rows() >= self.batch_size:
+                    self.flush_rows()
+        
+        return line_number
+    
+    def process_chunks(self, chunks, report_invalid):
+        """Flatten chunks of NDJSON lines in the process pool and add their rows in input order"""
+        options = (self.input_file, self.output_dir, self.decoder, self.resource_mappings, self.select)
+        line_number = 0
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=start_pipeline_worker, initargs=options) as pool:
+            for chunk in chunks:
+                pending.append(pool.submit(convert_chunk, chunk))
+                if self.instrumented:
+                    self.advance_progress(len(chunk), sum(len(line) for line in chunk))
+                
+                # Wait for the oldest chunk once the pool has pipeline_depth chunks in flight
+                if len(pending) >= self.pipeline_depth:
+                    line_number = self.add_chunk_rows(pending.popleft().result(), line_number, report_invalid)
+            
+            while pending:
+                line_number = self.add_chunk_rows(pending.popleft().result(), line_number, report_invalid)
+        
+        return line_number
+    
+    def add_chunk_rows(self, chunk, line_offset, report_invalid):
+        """Append the rows a worker flattened from a chunk, shifting surrogate IDs to follow the earlier chunks"""
+        for line_number, error in chunk['invalid_lines']:
+            report_invalid(line_offset + line_number, error)
+        
+        # Each chunk numbers its rows from 1, like the shards of process_file_parallel
+        self.add_numbered_rows(chunk['data'], chunk['counter'])
+        
+        if self.buffered_rows() >= self.batch_size:
+            self.flush_rows()
+        return line_offset + chunk['lines']
+    
+    def add_numbered_rows(self, data, counter):
+        """Append rows per table numbered from 1, shifting their surrogate IDs to follow the rows already added"""
+        for table, rows in data.items():
+            if not rows:
+                continue
+            
+            id_positions = [
+                (self.tables[table].index(col), self.counter[counter] - 1)
+                for col, counter in self.surrogate_ids.get(table, {}).items()
+            ]
+            if any(offset for position, offset in id_positions):
+                renumbered = []
+                for row in rows:
+                    row = list(row)
+                    for position, offset in id_positions:
+                        row[position] += offset
+                    renumbered.append(tuple(row))
+                rows = renumbered
+            self.data[table].extend(rows)
+        
+        for table, count in counter.items():
+            self.counter[table] += count - 1
+    
+    def process_line(self, line_number, line, report_invalid):
+        """Decode and process one non-empty NDJSON line"""
+        if self.record_cache is not None:
+            self.process_cached_line(line_number, line, report_invalid)
+            return
+        
+        try:
+            record = self.loads(line) if self.select is None else self.scan_record(line)
+        except ValueError as e:  # Also covers orjson and invalid UTF-8 errors
+            report_invalid(line_number, e)
+        else:
+            self.process_record(record)
+    
+    def scan_record(self, line):
+        """Decode only the parameters of a Parameters line that feed the selected tables"""
+        patterns = PARAMETERS_PATTERNS[type(line)]
+        header = patterns['header'].match(line)
+        body = line.rstrip()
+        if header is None or not body.endswith(patterns['end']):
+            return self.loads(line)
+        body = body[header.end():-len(patterns['end'])]
+        
+        # Top-level parameters are compact objects starting with "name", so the line splits
+        # between them; a split inside a parameter leaves unbalanced pieces that fail to decode
+        parts = body.split(patterns['separator']) if body.strip() else []
+        selected = []
+        for i, part in enumerate(parts):
+            if i > 0:
+                part = patterns['name'] + part
+            if i < len(parts) - 1:
+                part = part + patterns['close']
+            
+            resource = patterns['resource'].match(part)
+            if resource is not None:
+                resource_type = resource.group(1)
+                if isinstance(resource_type, bytes):
+                    resource_type = resource_type.decode()
+                if resource_type not in self.extractors:
+                    continue
+            elif patterns['value'].match(part) and 'parameter_values' not in self.tables:
+                continue
+            selected.append(part)
+        
+        # Decode the kept parameters together as one array
+        try:
+            params = self.loads(patterns['array'] % patterns['comma'].join(selected))
+        except ValueError:
+            # Not the expected layout, fall back to decoding the whole line
+            return self.loads(line)
+        
+        return {'resourceType': 'Parameters', 'id': self.loads(header.group(1)), 'parameter': params}
+    
+    def process_file_resumable(self):
+        """Process the input file from the last checkpoint, recording a new one after every batch"""
+        # Table files are appended to, so the converter always streams in this mode
+        self.streaming = True
+        offset, line_number = self.load_checkpoint()
+        self.resume_offset = offset
+        self.resume_rows = sum(self.rows_written.values())
+        
+        with open(self.input_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                start = offset
+                offset += len(line)
+                line_number += 1
+                
+                if start == 0 and line.startswith(UTF8_BOM):
+                    line = line[len(UTF8_BOM):]
+                if not line.strip():  # Skip empty lines
+                    continue
+                
+                self.process_line(line_number, line, self.report_invalid_json)
+                
+                if self.buffered_rows() >= self.batch_size:
+                    self.flush_rows()
+                    self.write_checkpoint(offset, line_number)
+        
+        self.flush_rows()
+        self.write_checkpoint(offset, line_number)
+    
+    def input_fingerprint(self, length):
+        """Hash the first bytes of the input file to detect a replaced file on resume"""
+        with open(self.input_file, 'rb') as f:
+            return hashlib.sha256(f.read(min(length, 1024 * 1024))).hexdigest()
+    
+    def load_checkpoint(self):
+        """Restore counters and table files from the manifest and return the input offset and line number"""
+        manifest = {'files': {}, 'counter': self.counter, 'rows_written': self.rows_written, 'table_sizes': {}}
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r') as f:
+                manifest = json.load(f)
+        self.checkpoint_manifest = manifest
+        
+        # Appending rows with other columns would mix two layouts in the table files
+        if manifest.get('tables', self.tables) != self.tables:
+            raise ValueError(f"{self.output_dir} was written with a different table selection and cannot be resumed")
+        
+        # Continue the ID sequences of the rows already in the output directory
+        self.counter.update(manifest['counter'])
+        self.rows_written.update(manifest['rows_written'])
+        
+        # Drop rows written after the last checkpoint; they are produced again from the input
+        for table in self.tables:
+            file_path = os.path.join(self.output_dir, f"{table}.csv")
+            size = manifest['table_sizes'].get(table, 0)
+            if size:
+                os.truncate(file_path, size)
+            elif os.path.exists(file_path):
+                os.remove(file_path)
+        
+        if self.typed_schema:
+            self.load_checkpoint_stats(manifest)
+        
+        progress = manifest['files'].get(os.path.abspath(self.input_file))
+        if progress is None:
+            # A new input file is appended on top of the existing output
+            return 0, 0
+        
+        if os.path.getsize(self.input_file) < progress['offset'] or \
+                self.input_fingerprint(progress['offset']) != progress['fingerprint']:
+            raise ValueError(f"{self.input_file} changed since the last checkpoint and cannot be resumed")
+        
+        if progress['offset'] < os.path.getsize(self.input_file):
+            print(f"Resuming {self.input_file} at line {progress['line_number'] + 1} (byte {progress['offset']})")
+        return progress['offset'], progress['line_number']
+    
+    def load_checkpoint_stats(self, manifest):
+        """Restore the column statistics of the rows kept from earlier runs"""
+        if not any(manifest['table_sizes'].values()):
+            return
+        if 'column_stats' not in manifest:
+            print(f"Warning: {self.checkpoint_path} has no column statistics, the schemas will be untyped")
+            self.typed_schema = False
+            return
+        
+        for table, columns in manifest['column_stats'].items():
+            for col, stats in columns.items():
+                self.column_stats[table][col] = {'length': stats['length'], 'kinds': set(stats['kinds'])}
+        
+        # The ID digests grow with every row, so rather than being saved in the manifest they
+        # are rebuilt from the kept rows of the tables with natural IDs or columns referencing them
+        keyed_tables = set(self.unique_ids) | {table for table, col in self.referenced_ids}
+        for table in self.tables:
+            file_path = os.path.join(self.output_dir, f"{table}.csv")
+            if table not in keyed_tables or not manifest['table_sizes'].get(table):
+                continue
+            with open(file_path, 'r', newline='') as f:
+                reader = csv.reader(f, delimiter='|')
+                rows = [tuple(row) for row in itertools.islice(reader, self.batch_size)]
+                while rows:
+                    self.gather_column_stats({table: rows})
+                    rows = [tuple(row) for row in itertools.islice(reader, self.batch_size)]
+    
+    def write_checkpoint(self, offset, line_number):
+        """Make flushed rows durable and record the progress needed to resume after them"""
+        table_sizes = {}
+        for table, csvfile in self.files.items():
+            csvfile.flush()
+            os.fsync(csvfile.fileno())
+        for table in self.tables:
+            file_path = os.path.join(self.output_dir, f"{table}.csv")
+            if os.path.exists(file_path):
+                table_sizes[table] = os.path.getsize(file_path)
+        
+        manifest = self.checkpoint_manifest
+        manifest['files'][os.path.abspath(self.input_file)] = {
+            'offset': offset,
+            'line_number': line_number,
+            'fingerprint': self.input_fingerprint(offset)
+        }
+        manifest['tables'] = self.tables
+        manifest['counter'] = self.counter
+        manifest['rows_written'] = self.rows_written
+        manifest['table_sizes'] = table_sizes
+        if self.typed_schema:
+            manifest['column_stats'] = {
+                table: {col: {'length': stats['length'], 'kinds': sorted(stats['kinds'])} for col, stats in columns.items()}
+                for table, columns in self.column_stats.items()
+            }
+        else:
+            manifest.pop('column_stats', None)
+        
+        # Replace the manifest atomically so a crash never leaves it half written
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+    
+    def report_invalid_json(self, line_number, error):
+        """Report a line that could not be decoded"""
+        print(f"Skipping invalid JSON at line {line_number}: {error}")
+    
+    def process_file_parallel(self):
+        """Process the input file as byte-range shards in a process pool"""
+        # Shard outputs are merged straight into the table files, so the
+        # converter behaves as in streaming mode from here on
+        self.streaming = True
+        
+        # Use a few shards per worker so uneven record sizes still balance out
+        ranges = split_byte_ranges(self.input_file, self.workers * 4)
+        shard_root = tempfile.mkdtemp(prefix='.shards-', dir=self.output_dir)
+        
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [
+                    pool.submit(
+                        convert_shard, self.input_file, os.path.join(shard_root, str(i)), start, end,
+                        self.decoder, self.resource_mappings, self.select, self.reader, self.typed_schema
+                    )
+                    for i, (start, end) in enumerate(ranges)
+                ]
+                shards = [future.result() for future in futures]
+            
+            # Report invalid lines with their line number in the whole file
+            line_offset = 0
+            for shard in shards:
+                for line_number, error in shard['invalid_lines']:
+                    self.report_invalid_json(line_offset + line_number, error)
+                line_offset += shard['lines']
+            
+            self.merge_shards(shards)
+        finally:
+            shutil.rmtree(shard_root, ignore_errors=True)
+    
+    def merge_shards(self, shards):
+        """Concatenate shard table files, shifting surrogate IDs to match a serial run"""
+        # Each shard numbers its rows from 1, so offset them by the IDs used in earlier shards
+        offsets = []
+        used = {table: 0 for table in self.tables}
+        for shard in shards:
+            offsets.append(dict(used))
+            for table in self.tables:
+                used[table] += shard['counter'][table] - 1
+        
+        def merge_table(table):
+            shard_files = [os.path.join(shard['output_dir'], f"{table}.csv") for shard in shards]
+            shard_files = [(path, offset) for path, offset in zip(shard_files, offsets) if os.path.exists(path)]
+            if not shard_files:
+                return
+            
+            id_positions = [
+                (self.tables[table].index(col), counter)
+                for col, counter in self.surrogate_ids.get(table, {}).items()
+            ]
+            
+            for path, offset in shard_files:
+                with open(path, 'r', newline='') as f:
+                    if not id_positions and not self.part_rows:
+                        # Natural keys need no renumbering, copy the file as it is
+                        out = self.files.get(table) or self.open_table_file(table)
+                        shutil.copyfileobj(f, out, 1024 * 1024)
+                        continue
+                    
+                    # Values were escaped when the shard was written, so rows are
+                    # copied through csv without escaping them a second time
+                    rows = []
+                    for row in csv.reader(f, delimiter='|', quotechar='"'):
+                        for position, counter in id_positions:
+                            row[position] = int(row[position]) + offset[counter]
+                        rows.append(row)
+                        if len(rows) == self.batch_size:
+                            self.write_csv_rows(table, rows, escape=False)
+                            rows = []
+                    self.write_csv_rows(table, rows, escape=False)
+        
+        self.write_tables(merge_table, list(self.tables))
+        self.close_writers()
+        
+        for table in self.tables:
+            self.counter[table] = 1 + sum(shard['counter'][table] - 1 for shard in shards)
+            self.rows_written[table] = sum(shard['rows_written'][table] for shard in shards)
+        
+        if self.typed_schema:
+            for shard in shards:
+                self.merge_column_stats(shard['column_stats'], shard['unique_ids'], shard['referenced_ids'])
+    
+    def buffered_rows(self):
+        """Return the number of rows held in memory across all tables"""
+        return sum(len(rows) for rows in self.data.values())
+    
+    def row_count(self, table):
+        """Return the total number of rows produced for a table"""
+        return self.rows_written[table] + len(self.data[table])
     
     def process_record(self, record):
         """Process a single FHIR record"""
@@ -53,10 +1692,11 @@ class FHIRToQuotedPipeDelimitedNoHeader:
             parameters_id = record['id']
             
             # Add to parameters table
-            self.data['parameters'].append({
-                'id': parameters_id,
-                'resourceType': record['resourceType']
-            })
+            if 'parameters' in self.data:
+                row = (parameters_id, record['resourceType'])
+                if self.positions['parameters'] is not None:
+                    row = tuple(row[i] for i in self.positions['parameters'])
+                self.data['parameters'].append(row)
             
             # Process parameters
             for param in record['parameter']:
@@ -69,21 +1709,14 @@ class FHIRToQuotedPipeDelimitedNoHeader:
         # Check if this parameter contains a resource
         if 'resource' in param:
             resource = param['resource']
-            resource_type = resource['resourceType']
-            
-            if resource_type == 'Patient':
-                self.process_patient(resource, parameters_id)
-            elif resource_type == 'Claim':
-                self.process_claim(resource, parameters_id)
-            elif resource_type == 'ExplanationOfBenefit':
-                self.process_eob(resource, parameters_id)
-        else:
+            extractor = self.extractors.get(resource['resourceType'])
+            
+            if extractor is not None:
+                extractor(resource, parameters_id, self.data, self.counter)
+        elif 'parameter_values' in self.data:
             # This is a simple parameter with a value
-            value_entry = {'id': self.counter['parameter_values'], 
-                          'parameters_id': parameters_id,
-                          'name': name,
-                          'value_type': None,
-                          'value': None}
+            value_type = None
+            value_text = None
             
             # Find the value field (valueBoolean, valueString, etc.)
             for key, value in param.items():
@@ -92,304 +1725,622 @@ class FHIRToQuotedPipeDelimitedNoHeader:
                     if value_type == '':
                         value_type = 'String'
                     
-                    value_entry['value_type'] = value_type
-                    
                     # Convert value to string for CSV storage
                     if isinstance(value, (bool, int, float)):
-                        value_entry['value'] = str(value)
+                        value_text = str(value)
                     elif isinstance(value, dict) and 'code' in value:
-                        value_entry['value'] = value['code']
+                        value_text = value['code']
                     else:
-                        value_entry['value'] = value
+                        value_text = value
                     
                     break
             
-            self.data['parameter_values'].append(value_entry)
+            # Parameter names and value types repeat in every record, share one string for each
+            name = self.strings.setdefault(name, name)
+            value_type = self.strings.setdefault(value_type, value_type)
+            
+            row = (self.counter['parameter_values'], parameters_id, name, value_type, value_text)
+            if self.positions['parameter_values'] is not None:
+                row = tuple(row[i] for i in self.positions['parameter_values'])
+            self.data['parameter_values'].append(row)
             self.counter['parameter_values'] += 1
     
-    def process_patient(self, patient, parameters_id):
-        """Process a Patient resource"""
-        patient_id = patient['id']
-        
-        # Basic patient info
-        patient_data = {
-            'id': patient_id,
-            'parameters_id': parameters_id,
-            'gender': patient.get('gender', ''),
-            'birthDate': patient.get('birthDate', ''),
-            'race_code': '',
-            'race_system': '',
-            'ethnicity_code': '',
-            'ethnicity_system': ''
-        }
+    def row_values(self, row):
+        """Return the values of a row with double quotes escaped by doubling them"""
+        values = []
+        for value in row:
+            if isinstance(value, str) and '"' in value:
+                value = value.replace('"', '""')
+            values.append(value)
+        return values
+    
+    def write_csv_rows(self, table, rows, escape=True):
+        """Write rows to a table file in chunks of batch_size, opening files as rows arrive"""
+        fields = len(self.tables[table])
         
-        # Extract race and ethnicity from extensions
-        if 'extension' in patient:
-            for ext in patient['extension']:
-                if 'url' in ext and ext['url'].endswith('us-core-race'):
-                    for race_ext in ext.get('extension', []):
-                        if race_ext.get('url') in ['ombCategory', 'detailed'] and 'valueCoding' in race_ext:
-                            patient_data['race_code'] = race_ext['valueCoding'].get('code', '')
-                            patient_data['race_system'] = race_ext['valueCoding'].get('system', '')
-                
-                if 'url' in ext and ext['url'].endswith('us-core-ethnicity'):
-                    for eth_ext in ext.get('extension', []):
-                        if eth_ext.get('url') == 'ombCategory' and 'valueCoding' in eth_ext:
-                            patient_data['ethnicity_code'] = eth_ext['valueCoding'].get('code', '')
-                            patient_data['ethnicity_system'] = eth_ext['valueCoding'].get('system', '')
-        
-        self.data['patients'].append(patient_data)
-        
-        # Process identifiers
-        if 'identifier' in patient:
-            for identifier in patient['identifier']:
-                self.data['patient_identifiers'].append({
-                    'id': self.counter['patient_identifiers'],
-                    'patient_id': patient_id,
-                    'system': identifier.get('system', ''),
-                    'value': identifier.get('value', ''),
-                    'use': identifier.get('use', '')
-                })
-                self.counter['patient_identifiers'] += 1
-        
-        # Process names
-        if 'name' in patient:
-            for name in patient['name']:
-                self.data['patient_names'].append({
-                    'id': self.counter['patient_names'],
-                    'patient_id': patient_id,
-                    'family': name.get('family', ''),
-                    'given': ' '.join(name.get('given', []))
-                })
-                self.counter['patient_names'] += 1
-        
-        # Process telecom
-        if 'telecom' in patient:
-            for telecom in patient['telecom']:
-                self.data['patient_telecom'].append({
-                    'id': self.counter['patient_telecom'],
-                    'patient_id': patient_id,
-                    'system': telecom.get('system', ''),
-                    'value': telecom.get('value', '')
-                })
-                self.counter['patient_telecom'] += 1
-        
-        # Process addresses
-        if 'address' in patient:
-            for address in patient['address']:
-                self.data['patient_addresses'].append({
-                    'id': self.counter['patient_addresses'],
-                    'patient_id': patient_id,
-                    'line': ' '.join(address.get('line', [])),
-                    'city': address.get('city', ''),
-                    'state': address.get('state', ''),
-                    'postalCode': address.get('postalCode', '')
-                })
-                self.counter['patient_addresses'] += 1
-    
-    def process_claim(self, claim, parameters_id):
-        """Process a Claim resource"""
-        claim_id = claim['id']
-        
-        # Get patient reference
-        patient_ref = claim.get('patient', {}).get('reference', '')
-        patient_id = patient_ref.split('/')[-1] if '/' in patient_ref else patient_ref
-        
-        # Get claim type
-        claim_type = ''
-        if 'type' in claim and 'coding' in claim['type']:
-            coding = claim['type']['coding'][0] if claim['type']['coding'] else None
-            claim_type = coding.get('code', '') if coding else ''
-        
-        # Basic claim info
-        self.data['claims'].append({
-            'id': claim_id,
-            'parameters_id': parameters_id,
-            'type': claim_type,
-            'patient_id': patient_id,
-            'servicedDate': ''  # Will get from items
-        })
-        
-        # Process diagnoses
-        if 'diagnosis' in claim:
-            for diag in claim['diagnosis']:
-                sequence = diag.get('sequence', '')
-                code = ''
-                system = ''
-                
-                if 'diagnosisCodeableConcept' in diag and 'coding' in diag['diagnosisCodeableConcept']:
-                    coding = diag['diagnosisCodeableConcept']['coding'][0] if diag['diagnosisCodeableConcept']['coding'] else None
-                    if coding:
-                        code = coding.get('code', '')
-                        system = coding.get('system', '')
-                
-                self.data['claim_diagnoses'].append({
-                    'id': self.counter['claim_diagnoses'],
-                    'claim_id': claim_id,
-                    'sequence': sequence,
-                    'code': code,
-                    'system': system
-                })
-                self.counter['claim_diagnoses'] += 1
-        
-        # Process items
-        if 'item' in claim:
-            for item in claim['item']:
-                sequence = item.get('sequence', '')
-                code = ''
-                system = ''
-                serviced_date = item.get('servicedDate', '')
-                
-                # Update claim with first item's service date if available
-                if serviced_date and not self.data['claims'][-1]['servicedDate']:
-                    self.data['claims'][-1]['servicedDate'] = serviced_date
-                
-                if 'productOrService' in item and 'coding' in item['productOrService']:
-                    coding = item['productOrService']['coding'][0] if item['productOrService']['coding'] else None
-                    if coding:
-                        code = coding.get('code', '')
-                        system = coding.get('system', '')
-                
-                self.data['claim_items'].append({
-                    'id': self.counter['claim_items'],
-                    'claim_id': claim_id,
-                    'sequence': sequence,
-                    'productOrService_code': code,
-                    'productOrService_system': system,
-                    'servicedDate': serviced_date
-                })
-                self.counter['claim_items'] += 1
-    
-    def process_eob(self, eob, parameters_id):
-        """Process an ExplanationOfBenefit resource"""
-        eob_id = eob['id']
-        
-        # Get patient reference
-        patient_ref = eob.get('patient', {}).get('reference', '')
-        patient_id = patient_ref.split('/')[-1] if '/' in patient_ref else patient_ref
-        
-        # Get EOB type
-        eob_type = ''
-        if 'type' in eob and 'coding' in eob['type']:
-            coding = eob['type']['coding'][0] if eob['type']['coding'] else None
-            eob_type = coding.get('code', '') if coding else ''
-        
-        # Basic EOB info
-        self.data['explanation_of_benefits'].append({
-            'id': eob_id,
-            'parameters_id': parameters_id,
-            'status': eob.get('status', ''),
-            'type': eob_type,
-            'patient_id': patient_id,
-            'outcome': eob.get('outcome', '')
-        })
-        
-        # Process diagnoses
-        if 'diagnosis' in eob:
-            for diag in eob['diagnosis']:
-                sequence = diag.get('sequence', '')
-                code = ''
-                system = ''
-                
-                if 'diagnosisCodeableConcept' in diag and 'coding' in diag['diagnosisCodeableConcept']:
-                    coding = diag['diagnosisCodeableConcept']['coding'][0] if diag['diagnosisCodeableConcept']['coding'] else None
-                    if coding:
-                        code = coding.get('code', '')
-                        system = coding.get('system', '')
-                
-                self.data['eob_diagnoses'].append({
-                    'id': self.counter['eob_diagnoses'],
-                    'eob_id': eob_id,
-                    'sequence': sequence,
-                    'code': code,
-                    'system': system
-                })
-                self.counter['eob_diagnoses'] += 1
-        
-        # Process items
-        if 'item' in eob:
-            for item in eob['item']:
-                sequence = item.get('sequence', '')
-                code = ''
-                system = ''
-                serviced_date = item.get('servicedDate', '')
+        start = 0
+        while start < len(rows):
+            size = self.batch_size
+            if self.part_rows:
+                # Close a full part file; the next one is only opened when rows are left
+                room = self.part_rows - self.part_sizes.get(table, 0)
+                if table in self.files and room == 0:
+                    self.files.pop(table).close()
+                    room = self.part_rows
+                size = min(size, room)
+            csvfile = self.files.get(table) or self.open_table_file(table)
+            
+            chunk = rows[start:start + size]
+            buffer = io.StringIO()
+            csv.writer(buffer, delimiter='|', quotechar='"', quoting=csv.QUOTE_ALL).writerows(chunk)
+            text = buffer.getvalue()
+            
+            # Every field is exactly two quote characters unless a value contains a double quote;
+            # only then are the values escaped first, which the csv writer escapes once more
+            if escape and text.count('"') != 2 * fields * len(chunk):
+                buffer = io.StringIO()
+                csv.writer(buffer, delimiter='|', quotechar='"', quoting=csv.QUOTE_ALL).writerows(
+                    self.row_values(row) for row in chunk
+                )
+                text = buffer.getvalue()
+            csvfile.write(text)
+            
+            if self.part_rows:
+                self.part_sizes[table] += len(chunk)
+            start += len(chunk)
+    
+    def table_file_name(self, table, part=None):
+        """Return the file name of a table, or of one of its part files"""
+        extension = TABLE_COMPRESSION_EXTENSIONS[self.compression]
+        if part is None:
+            return f"{table}.csv{extension}"
+        return f"{table}.part-{part}.csv{extension}"
+    
+    def remove_table_files(self):
+        """Delete the table files of earlier runs, which other compression or part settings would not overwrite"""
+        removed = 0
+        for table in self.tables:
+            names = [f"{table}.parquet"]
+            for extension in TABLE_COMPRESSION_EXTENSIONS.values():
+                names.append(f"{table}.csv{extension}")
+                names.append(f"{table}.part-*.csv{extension}")
+            for name in names:
+                for file_path in glob.glob(os.path.join(glob.escape(self.output_dir), name)):
+                    os.remove(file_path)
+                    removed += 1
+        if removed:
+            print(f"Removed {removed} table files of an earlier run from {self.output_dir}")
+    
+    def open_table_file(self, table):
+        """Open the output file, or the next part file, of a table and return it"""
+        part = None
+        if self.part_rows:
+            self.parts[table] = self.parts.get(table, 0) + 1
+            self.part_sizes[table] = 0
+            part = f"{self.parts[table]:04d}"
+        file_path = os.path.join(self.output_dir, self.table_file_name(table, part))
+        
+        # Checkpointed runs append to the rows kept from earlier runs
+        mode = 'a' if self.checkpoint else 'w'
+        if self.compression == 'gzip':
+            csvfile = gzip.open(file_path, mode + 't', compresslevel=6, newline='')
+        elif self.compression == 'zstd':
+            csvfile = zstandard.open(file_path, mode + 't', newline='')
+        else:
+            csvfile = open(file_path, mode, newline='', buffering=WRITE_BUFFER_SIZE)
+        
+        self.files[table] = csvfile
+        return csvfile
+    
+    def write_tables(self, function, tables):
+        """Call function for each table, on export_threads threads when there are several"""
+        if self.export_threads <= 1 or len(tables) <= 1:
+            for table in tables:
+                function(table)
+            return
+        
+        # Each table has its own files and part state, so tables are written independently
+        if self.export_pool is None:
+            self.export_pool = ThreadPoolExecutor(max_workers=self.export_threads)
+        for future in [self.export_pool.submit(function, table) for table in tables]:
+            future.result()
+    
+    def exported_files(self, table):
+        """Describe the file of a table, or its part files, for the export messages"""
+        if self.part_rows:
+            file_path = os.path.join(self.output_dir, self.table_file_name(table, '*'))
+            return f"{file_path} ({self.parts[table]} parts)"
+        return os.path.join(self.output_dir, self.table_file_name(table))
+    
+    def flush_rows(self):
+        """Write all buffered rows to their table files and release them (streaming mode)"""
+        batch = {table: rows for table, rows in self.data.items() if rows}
+        self.resolve_patient_aliases(batch)
+        if self.typed_schema:
+            self.gather_column_stats(batch)
+        
+        # The pipeline mode writes behind on a thread; sqlite3 connections stay on their own thread
+        if self.pipeline and self.database is None:
+            self.write_behind_rows(batch)
+        else:
+            self.write_rows(batch)
+        
+        for table in batch:
+            self.rows_written[table] += len(batch[table])
+            self.data[table] = []
+        
+        if self.database is not None:
+            self.database.commit()
+        
+        # Patients are recorded in the index once their rows are written
+        if self.patient_index is not None:
+            self.patient_index.commit()
+    
+    def gather_column_stats(self, batch):
+        """Add the value kinds and lengths of a batch of rows per table to the column statistics"""
+        for table, rows in batch.items():
+            surrogate_ids = self.surrogate_ids.get(table, {})
+            for col, column in zip(self.tables[table], zip(*rows)):
+                if col in surrogate_ids:
+                    continue
                 
-                if 'productOrService' in item and 'coding' in item['productOrService']:
-                    coding = item['productOrService']['coding'][0] if item['productOrService']['coding'] else None
-                    if coding:
-                        code = coding.get('code', '')
-                        system = coding.get('system', '')
+                # Distinct values only, so repeated codes and systems are classified once per batch
+                try:
+                    values = set(column)
+                except TypeError:  # Nested lists and objects are written as their text form
+                    values = {value if value is None or isinstance(value, (str, int, float)) else str(value) for value in column}
+                values.discard('')
+                values.discard(None)
+                if not values:
+                    continue
                 
-                item_id = self.counter['eob_items']
-                self.data['eob_items'].append({
-                    'id': item_id,
-                    'eob_id': eob_id,
-                    'sequence': sequence,
-                    'productOrService_code': code,
-                    'productOrService_system': system,
-                    'servicedDate': serviced_date
-                })
-                self.counter['eob_items'] += 1
+                if (table, col) in self.referenced_ids and self.unique_ids[self.foreign_keys[col]] is not None:
+                    self.referenced_ids[table, col].update(
+                        hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest() for value in values
+                    )
                 
-                # Process adjudications
-                if 'adjudication' in item:
-                    for adj in item['adjudication']:
-                        category_code = ''
-                        category_system = ''
-                        amount_value = ''
-                        amount_currency = ''
-                        
-                        if 'category' in adj and 'coding' in adj['category']:
-                            coding = adj['category']['coding'][0] if adj['category']['coding'] else None
-                            if coding:
-                                category_code = coding.get('code', '')
-                                category_system = coding.get('system', '')
-                        
-                        if 'amount' in adj:
-                            amount_value = str(adj['amount'].get('value', ''))
-                            amount_currency = adj['amount'].get('currency', '')
-                        
-                        self.data['eob_adjudications'].append({
-                            'id': self.counter['eob_adjudications'],
-                            'eob_item_id': item_id,
-                            'category_code': category_code,
-                            'category_system': category_system,
-                            'amount_value': amount_value,
-                            'amount_currency': amount_currency
-                        })
-                        self.counter['eob_adjudications'] += 1
+                stats = self.column_stats[table][col]
+                stats['length'] = max(stats['length'], max(len(value if isinstance(value, str) else str(value)) for value in values))
+                if 'text' not in stats['kinds']:
+                    stats['kinds'].update(value_kind(value) for value in values)
+            
+            # A natural ID is a usable key while no digest repeats; the digests are dropped once one does
+            ids = self.unique_ids.get(table)
+            if ids is not None:
+                position = self.tables[table].index('id')
+                size = len(ids)
+                ids.update(hashlib.blake2b(str(row[position]).encode('utf-8'), digest_size=8).digest() for row in rows)
+                if len(ids) - size < len(rows):
+                    self.unique_ids[table] = None
+    
+    def merge_column_stats(self, column_stats, unique_ids, referenced_ids):
+        """Add the column statistics of another converter over different rows, e.g. a shard"""
+        for table, columns in column_stats.items():
+            for col, stats in columns.items():
+                merged = self.column_stats[table][col]
+                merged['length'] = max(merged['length'], stats['length'])
+                merged['kinds'] |= stats['kinds']
+        
+        for table, ids in unique_ids.items():
+            merged = self.unique_ids[table]
+            if merged is None or ids is None or not merged.isdisjoint(ids):
+                self.unique_ids[table] = None
+            else:
+                merged |= ids
+        
+        for column, ids in referenced_ids.items():
+            self.referenced_ids[column] |= ids
+    
+    def write_rows(self, batch):
+        """Write a batch of rows per table to the database, Parquet or table files"""
+        if self.database is not None:
+            for table, rows in batch.items():
+                self.insert_rows(table, rows)
+        elif self.output_format == 'parquet':
+            for table, rows in batch.items():
+                self.write_parquet_rows(table, rows)
+        else:
+            # Files are opened on the first row so empty tables produce no file
+            self.write_tables(lambda table: self.write_csv_rows(table, batch[table]), list(batch))
+    
+    def write_behind_rows(self, batch):
+        """Queue a batch for the writer thread, waiting while pipeline_depth batches are queued"""
+        if self.write_behind is None:
+            self.write_behind = ThreadPoolExecutor(max_workers=1)
+        self.pending_writes.append(self.write_behind.submit(self.write_rows, batch))
+        
+        # Batches are written one at a time in order, and a failed write surfaces here
+        while len(self.pending_writes) > self.pipeline_depth or (self.pending_writes and self.pending_writes[0].done()):
+            self.pending_writes.popleft().result()
+    
+    def finish_writes(self):
+        """Wait for the writer thread to write every queued batch"""
+        while self.pending_writes:
+            self.pending_writes.popleft().result()
+        if self.write_behind is not None:
+            self.write_behind.shutdown()
+            self.write_behind = None
+    
+    def close_writers(self):
+        """Close all table files opened in streaming mode and the export threads"""
+        self.finish_writes()
+        for csvfile in self.files.values():
+            csvfile.close()
+        self.files = {}
+        if self.export_pool is not None:
+            self.export_pool.shutdown()
+            self.export_pool = None
     
     def export_to_quoted_pipe_delimited_no_header(self):
         """Export all tables to pipe-delimited CSV files with quoted fields but no headers"""
+        if self.streaming:
+            # Most rows are already on disk; write the remainder and close the files
+            self.flush_rows()
+            self.close_writers()
+            
+            for table in self.tables:
+                if self.rows_written[table]:
+                    print(f"Exported {self.rows_written[table]} rows to {self.exported_files(table)}")
+            self.close_patient_index()
+            self.close_record_cache()
+            return
+        
+        # Skip empty tables
+        tables = [table for table in self.tables if self.data[table]]
+        self.resolve_patient_aliases(self.data)
+        if self.typed_schema:
+            self.gather_column_stats({table: self.data[table] for table in tables})
+        self.write_tables(lambda table: self.write_csv_rows(table, self.data[table]), tables)
+        self.close_writers()
+        
+        for table in tables:
+            print(f"Exported {len(self.data[table])} rows to {self.exported_files(table)}")
+        self.close_patient_index()
+        self.close_record_cache()
+    
+    def column_sql_type(self, table, col):
+        """Return the generic SQL type of a column: INTEGER for surrogate IDs, VARCHAR for the other key and join columns, TEXT otherwise"""
+        if col in self.surrogate_ids.get(table, {}):
+            return "INTEGER"
+        
+        # Indexed columns need a length in e.g. MySQL; the longest value seen so far is known
+        # when the table is created, and FHIR IDs fit the minimum when the rest is not
+        if col == 'id' or col in self.foreign_keys:
+            return f"VARCHAR({max(self.column_stats[table][col]['length'], DATABASE_KEY_LENGTH)})"
+        return "TEXT"
+    
+    def quote(self, name):
+        """Return a table or column name quoted for the database, since names like use and system are reserved words"""
+        quote = self.database_state['quote']
+        return f"{quote}{name}{quote}"
+    
+    def placeholder(self, position):
+        """Return the bind parameter marker for a column position in the connection's paramstyle"""
+        if self.paramstyle == 'qmark':
+            return '?'
+        if self.paramstyle in ('format', 'pyformat'):
+            return '%s'
+        if self.paramstyle in ('numeric', 'named'):
+            return f":{position}"
+        raise ValueError(f"Unsupported paramstyle: {self.paramstyle}")
+    
+    def begin_database_load(self):
+        """Create the tables without keys or indexes and tune SQLite for a bulk load"""
+        if self.paramstyle is None:
+            self.paramstyle = 'qmark' if isinstance(self.database, sqlite3.Connection) else driver_paramstyle(self.database)
+        
+        cursor = self.database.cursor()
+        self.database_state = {'insert_sql': {}, 'pragmas': {}, 'quote': identifier_quote(self.database)}
+        quote = self.quote
+        
+        if isinstance(self.database, sqlite3.Connection):
+            # Remember the current settings and trade durability for speed until the load ends
+            for pragma, value in [('journal_mode', 'OFF'), ('synchronous', 'OFF'), ('cache_size', '-262144')]:
+                self.database_state['pragmas'][pragma] = cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+                cursor.execute(f"PRAGMA {pragma} = {value}")
+        
         for table, columns in self.tables.items():
-            if not self.data[table]:  # Skip empty tables
-                continue
+            col_defs = ", ".join(f"{quote(col)} {self.column_sql_type(table, col)}" for col in columns)
+            cursor.execute(f"CREATE TABLE {quote(table)} ({col_defs})")
+            
+            # Prepare each INSERT statement once and reuse it for every batch
+            markers = ", ".join(self.placeholder(i + 1) for i in range(len(columns)))
+            self.database_state['insert_sql'][table] = (
+                f"INSERT INTO {quote(table)} ({', '.join(quote(col) for col in columns)}) VALUES ({markers})"
+            )
+        
+        self.database.commit()
+    
+    def insert_rows(self, table, rows):
+        """Bulk insert rows into a database table (the caller commits)"""
+        if self.database_state is None:
+            self.begin_database_load()
+        
+        # Values the csv writer would stringify (e.g. valuePeriod dicts) are stringified the same way
+        values = [
+            row if all(value is None or isinstance(value, (str, int, float)) for value in row)
+            else tuple(value if value is None or isinstance(value, (str, int, float)) else str(value) for value in row)
+            for row in rows
+        ]
+        
+        self.database.cursor().executemany(self.database_state['insert_sql'][table], values)
+    
+    def finish_database_load(self):
+        """Add keys and indexes now that the data is loaded, then restore the SQLite settings"""
+        cursor = self.database.cursor()
+        is_sqlite = isinstance(self.database, sqlite3.Connection)
+        quote = self.quote
+        
+        for table, columns in self.tables.items():
+            # Surrogate IDs are unique; natural IDs can repeat across Parameters records
+            if 'id' in self.surrogate_ids.get(table, {}):
+                if is_sqlite:
+                    cursor.execute(f"CREATE UNIQUE INDEX {quote(f'ix_{table}_id')} ON {quote(table)} ({quote('id')})")
+                else:
+                    cursor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY ({quote('id')})")
+            else:
+                cursor.execute(f"CREATE INDEX {quote(f'ix_{table}_id')} ON {quote(table)} ({quote('id')})")
+            
+            for col in columns:
+                if col not in self.foreign_keys:
+                    continue
+                cursor.execute(f"CREATE INDEX {quote(f'ix_{table}_{col}')} ON {quote(table)} ({quote(col)})")
                 
-            file_path = os.path.join(self.output_dir, f"{table}.csv")
+                # SQLite cannot add constraints to existing tables, and only
+                # surrogate IDs are unique enough to be referenced
+                referenced = self.foreign_keys[col]
+                if not is_sqlite and 'id' in self.surrogate_ids.get(referenced, {}):
+                    cursor.execute(
+                        f"ALTER TABLE {quote(table)} ADD FOREIGN KEY ({quote(col)}) REFERENCES {quote(referenced)} ({quote('id')})"
+                    )
+        
+        self.database.commit()
+        
+        for pragma, value in self.database_state['pragmas'].items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+    
+    def export_to_database(self, database=None):
+        """Load all tables into a DB-API database, creating keys and indexes after the load"""
+        if database is not None:
+            self.database = database
+        
+        # Insert what is still buffered; in streaming mode the rest is already loaded. The
+        # tables are created on the first insert, once the lengths of the buffered rows are known
+        self.flush_rows()
+        if self.database_state is None:
+            self.begin_database_load()
+        self.finish_database_load()
+        
+        for table in self.tables:
+            if self.rows_written[table]:
+                print(f"Loaded {self.rows_written[table]} rows into {table}")
+        self.close_patient_index()
+        self.close_record_cache()
+    
+    def parquet_column_type(self, table, col):
+        """Return the type name of a column in the Parquet output"""
+        if col in self.surrogate_ids.get(table, {}):
+            return 'int'
+        if col == 'value_boolean':
+            return 'bool'
+        return self.parquet_types.get(col, 'string')
+    
+    def parquet_schema(self, table):
+        """Build the Arrow schema of a table"""
+        arrow_types = {
+            'int': pyarrow.int64(),
+            'bool': pyarrow.bool_(),
+            'decimal': pyarrow.decimal128(PARQUET_DECIMAL_PRECISION, PARQUET_DECIMAL_SCALE),
+            'date': pyarrow.date32(),
+            'string': pyarrow.string()
+        }
+        
+        fields = []
+        for col in self.parquet_columns(table):
+            if col in self.dictionary_columns:
+                arrow_type = pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+            else:
+                arrow_type = arrow_types[self.parquet_column_type(table, col)]
+            fields.append(pyarrow.field(col, arrow_type))
+        return pyarrow.schema(fields)
+    
+    def parquet_columns(self, table):
+        """Return the Parquet columns of a table; parameter_values also gets a typed Boolean column"""
+        if table == 'parameter_values' and {'value', 'value_type'} <= set(self.tables[table]):
+            return self.tables[table] + ['value_boolean']
+        return self.tables[table]
+    
+    def parquet_value(self, kind, value):
+        """Convert a flattened value to its Parquet representation; empty values become null"""
+        if value is None or value == '':
+            return None
+        if kind == 'int':
+            return int(value)
+        if kind == 'decimal':
+            # Arrow refuses to drop places itself, so round half to even to the column scale
+            return Decimal(str(value)).quantize(Decimal(1).scaleb(-PARQUET_DECIMAL_SCALE), rounding=ROUND_HALF_EVEN)
+        if kind == 'date':
+            # Columns only stay dates while all their values are full dates
+            return date.fromisoformat(value)
+        return value if isinstance(value, str) else str(value)
+    
+    def write_parquet_rows(self, table, rows):
+        """Append rows to a table's Parquet file as record batches of at most batch_size rows"""
+        writer = self.parquet_writers.get(table)
+        schema = self.parquet_schema(table) if writer is None else writer.schema
+        columns = self.tables[table]
+        
+        # Partial FHIR dates (year or year-month) have no date equivalent, so a date
+        # column holding one, or an invalid date, becomes a string column instead
+        for i, field in enumerate(schema):
+            if field.type == pyarrow.date32():
+                position = columns.index(field.name)
+                if not all(row[position] in (None, '') or full_date(row[position]) is not None for row in rows):
+                    schema = schema.set(i, pyarrow.field(field.name, pyarrow.string()))
+        
+        file_path = os.path.join(self.output_dir, f"{table}.parquet")
+        if writer is None:
+            writer = pyarrow.parquet.ParquetWriter(file_path, schema)
+            self.parquet_writers[table] = writer
+        elif schema != writer.schema:
+            # Earlier batches of a streaming run are already written as dates: rewrite them as strings
+            writer.close()
+            written = pyarrow.parquet.read_table(file_path).cast(schema)
+            writer = pyarrow.parquet.ParquetWriter(file_path, schema)
+            writer.write_table(written, row_group_size=self.batch_size)
+            self.parquet_writers[table] = writer
+        
+        for start in range(0, len(rows), self.batch_size):
+            chunk = rows[start:start + self.batch_size]
             
-            with open(file_path, 'w', newline='') as csvfile:
-                # Create a writer that will not write a header but will quote all fields
-                writer = csv.writer(
-                    csvfile,
-                    delimiter='|',
-                    quotechar='"',
-                    quoting=csv.QUOTE_ALL
-                )
+            arrays = []
+            for field in schema:
+                col = field.name
+                if col == 'value_boolean':
+                    value, value_type = columns.index('value'), columns.index('value_type')
+                    values = [row[value] == 'True' if row[value_type] == 'Boolean' else None for row in chunk]
+                else:
+                    kind = self.parquet_column_type(table, col)
+                    if kind == 'date' and field.type != pyarrow.date32():
+                        kind = 'string'
+                    position = columns.index(col)
+                    values = [self.parquet_value(kind, row[position]) for row in chunk]
                 
-                # For each row, extract values in the same order as columns
-                for row in self.data[table]:
-                    # Extract values in the correct order
-                    values = []
-                    for col in columns:
-                        value = row.get(col, '')
-                        # Escape double quotes by doubling them
-                        if isinstance(value, str) and '"' in value:
-                            value = value.replace('"', '""')
-                        values.append(value)
-                    
-                    writer.writerow(values)
+                if col in self.dictionary_columns:
+                    arrays.append(pyarrow.array(values, type=pyarrow.string()).dictionary_encode())
+                else:
+                    arrays.append(pyarrow.array(values, type=field.type))
+            
+            writer.write_batch(pyarrow.record_batch(arrays, schema=schema))
+    
+    def export_to_parquet(self):
+        """Export all tables to typed Parquet files, one per table"""
+        # In streaming mode most batches are already written
+        self.flush_rows()
+        self.finish_writes()
+        
+        for table, writer in self.parquet_writers.items():
+            writer.close()
+            print(f"Exported {self.rows_written[table]} rows to {os.path.join(self.output_dir, f'{table}.parquet')}")
+        self.parquet_writers = {}
+        self.close_patient_index()
+        self.close_record_cache()
+    
+    def column_kind(self, table, col):
+        """Return the type of a column from its statistics: integer, decimal, date, timestamp, varchar or text"""
+        if col in self.surrogate_ids.get(table, {}):
+            return 'integer'
+        
+        kinds = self.column_stats[table][col]['kinds']
+        if not kinds:
+            return 'text'  # Never had a value
+        
+        # Only the numeric Parquet columns become numbers; digit-only identifiers, codes
+        # and postal codes stay text so their leading zeros survive
+        declared = self.parquet_types.get(col)
+        if declared == 'int' and kinds <= {'int'}:
+            return 'integer'
+        if declared == 'decimal' and kinds <= {'int', 'decimal'}:
+            return 'decimal'
+        if kinds == {'date'}:
+            return 'date'
+        if kinds <= {'date', 'datetime'}:
+            return 'timestamp'
+        return 'varchar'
+    
+    def has_primary_key(self, table):
+        """Return whether a table's id can be its primary key: a surrogate ID, or a natural ID that never repeated"""
+        if 'id' not in self.tables.get(table, []):
+            return False
+        return 'id' in self.surrogate_ids.get(table, {}) or self.unique_ids.get(table) is not None
+    
+    def typed_column_sql(self, table, col, access=False):
+        """Return the typed SQL declaration of a column in the generic or the Access schema"""
+        kind = self.column_kind(table, col)
+        length = self.column_stats[table][col]['length']
+        
+        if access:
+            if col == 'id' and 'id' in self.surrogate_ids.get(table, {}):
+                return "COUNTER PRIMARY KEY"
+            
+            # Access has no time zones, so FHIR dateTimes are kept as text
+            data_type = {'integer': "LONG", 'decimal': "DOUBLE", 'date': "DATETIME"}.get(kind)
+            if data_type is None:
+                data_type = "MEMO" if length > 255 else f"TEXT({length or 255})"
+        else:
+            data_type = {
+                'integer': "INTEGER",
+                'decimal': "DECIMAL(18, 6)",
+                'date': "DATE",
+                'timestamp': "TIMESTAMP WITH TIME ZONE",
+                'varchar': f"VARCHAR({length})",
+                'text': "TEXT"
+            }[kind]
+        
+        if col == 'id':
+            data_type += " NOT NULL PRIMARY KEY" if self.has_primary_key(table) else " NOT NULL"
+        
+        # Foreign keys are column constraints, since SQLite cannot add them with ALTER TABLE
+        referenced = self.referenced_table(col)
+        if referenced is not None and self.has_foreign_key(table, col):
+            data_type += f" CONSTRAINT fk_{table}_{col} REFERENCES {referenced} (id)"
+        return data_type
+    
+    def has_foreign_key(self, table, col):
+        """Return whether a column can declare a foreign key: the referenced id is a key holding every value of the column"""
+        if not self.has_primary_key(self.foreign_keys[col]):
+            return False
+        referenced_ids = self.referenced_ids.get((table, col))
+        return referenced_ids is None or referenced_ids <= self.unique_ids[self.foreign_keys[col]]
+    
+    def referenced_table(self, col):
+        """Return the table a column references when that table is part of the output, else None"""
+        referenced = self.foreign_keys.get(col)
+        return referenced if referenced in self.tables else None
+    
+    def schema_tables(self):
+        """Return the tables in their output order, moving referenced tables before the tables referencing them"""
+        ordered = {}
+        
+        def add(table):
+            if table in ordered:
+                return
+            for col in self.tables[table]:
+                referenced = self.referenced_table(col)
+                if referenced is not None and referenced != table:
+                    add(referenced)
+            ordered[table] = self.tables[table]
+        
+        for table in self.tables:
+            add(table)
+        return ordered
+    
+    def key_sql(self, comment):
+        """Return the notes on missing foreign keys and the join column indexes of the typed schemas"""
+        indexes = []
+        notes = []
+        for table, columns in self.schema_tables().items():
+            # Natural IDs that repeat across Parameters records get an index instead of a primary key
+            if 'id' in columns and not self.has_primary_key(table):
+                indexes.append(f"CREATE INDEX ix_{table}_id ON {table} (id);\n")
             
-            print(f"Exported {len(self.data[table])} rows to {file_path}")
+            for col in columns:
+                referenced = self.referenced_table(col)
+                if referenced is None:
+                    continue
+                indexes.append(f"CREATE INDEX ix_{table}_{col} ON {table} ({col});\n")
+                
+                if not self.has_primary_key(referenced):
+                    notes.append(comment(f"{table}.{col} has no foreign key, {referenced}.id repeats across Parameters records"))
+                elif not self.has_foreign_key(table, col):
+                    notes.append(comment(f"{table}.{col} has no foreign key, not every value is in {referenced}.id"))
+        
+        sql = ""
+        if notes:
+            sql += "".join(notes) + "\n"
+        if indexes:
+            sql += comment("Indexes on the join columns") + "".join(indexes) + "\n"
+        return sql
     
     def generate_schema_sql(self):
         """Generate SQL schema for the database tables"""
@@ -399,10 +2350,15 @@ class FHIRToQuotedPipeDelimitedNoHeader:
             f.write("-- FHIR to Relational Database Schema\n")
             f.write(f"-- Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
             
-            # Generate CREATE TABLE statements
-            for table, columns in self.tables.items():
+            # Generate CREATE TABLE statements, referenced tables first
+            for table, columns in self.schema_tables().items():
                 f.write(f"CREATE TABLE {table} (\n")
                 
+                if self.typed_schema:
+                    f.write(",\n".join(f"    {col} {self.typed_column_sql(table, col)}" for col in columns))
+                    f.write("\n);\n\n")
+                    continue
+                
                 col_defs = []
                 for col in columns:
                     data_type = "INTEGER PRIMARY KEY" if col == 'id' else "TEXT"
@@ -411,6 +2367,11 @@ class FHIRToQuotedPipeDelimitedNoHeader:
                     fk_comment = ""
                     if col.endswith('_id') and col != 'id':
                         referenced_table = col[:-3]
+                        
+                        # Normalized codes are integer IDs into the code lookup tables
+                        if self.foreign_keys.get(col) in CODE_TABLES:
+                            data_type = "INTEGER"
+                            referenced_table = self.foreign_keys[col]
                         fk_comment = f" -- Foreign key to {referenced_table}(id)"
                     
                     col_defs.append(f"    {col} {data_type}{fk_comment}")
@@ -418,6 +2379,9 @@ class FHIRToQuotedPipeDelimitedNoHeader:
                 f.write(",\n".join(col_defs))
                 f.write("\n);\n\n")
             
+            if self.typed_schema:
+                f.write(self.key_sql(lambda note: f"-- {note}\n"))
+            
             print(f"Generated SQL schema at {sql_path}")
     
     def generate_microsoft_access_sql(self):
@@ -428,17 +2392,21 @@ class FHIRToQuotedPipeDelimitedNoHeader:
             f.write("/* FHIR to Relational Database Schema for Microsoft Access\n")
             f.write(f"   Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} */\n\n")
             
-            # Generate CREATE TABLE statements for Access
-            for table, columns in self.tables.items():
+            # Generate CREATE TABLE statements for Access, referenced tables first
+            for table, columns in self.schema_tables().items():
                 f.write(f"CREATE TABLE {table} (\n")
                 
                 col_defs = []
                 for col in columns:
-                    # Use Access-specific data types
-                    if col == 'id' and 'patient' not in table and 'parameters' not in table:
+                    # Use Access-specific data types, surrogate ids are numbered by the converter
+                    if self.typed_schema:
+                        data_type = self.typed_column_sql(table, col, access=True)
+                    elif col == 'id' and 'id' in self.surrogate_ids.get(table, {}):
                         data_type = "COUNTER PRIMARY KEY"
                     elif col == 'id':
                         data_type = "TEXT(50) PRIMARY KEY"
+                    elif self.foreign_keys.get(col) in CODE_TABLES:
+                        data_type = "LONG"
                     elif col.endswith('_id'):
                         data_type = "TEXT(50)"
                     elif col in ['line', 'value']:
@@ -455,6 +2423,9 @@ class FHIRToQuotedPipeDelimitedNoHeader:
                 f.write(",\n".join(col_defs))
                 f.write("\n);\n\n")
             
+            if self.typed_schema:
+                f.write(self.key_sql(lambda note: f"/* {note} */\n"))
+            
             print(f"Generated Microsoft Access SQL schema at {access_sql_path}")
     
     def generate_field_maps(self):
@@ -476,29 +2447,379 @@ class FHIRToQuotedPipeDelimitedNoHeader:
             
             print(f"Generated field map at {file_path}")
 
-def main():
-    input_file = '81779-amr_supporting_evidence.ndjson'
-    output_dir = 'fhir_relational_quoted_pipe_no_header'
+def driver_paramstyle(connection):
+    """Return the paramstyle of the DB-API driver of a connection, from its most specific module that declares one"""
+    # Connections do not expose paramstyle, their driver module does, e.g. mysql.connector rather than mysql
+    parts = type(connection).__module__.split('.')
+    for end in range(len(parts), 0, -1):
+        paramstyle = getattr(sys.modules.get('.'.join(parts[:end])), 'paramstyle', None)
+        if paramstyle is not None:
+            return paramstyle
+    raise ValueError(f"Cannot tell the paramstyle of {type(connection).__module__} connections, pass paramstyle=")
+
+def identifier_quote(connection):
+    """Return the identifier quote character of the SQL dialect of a connection's driver"""
+    return DRIVER_IDENTIFIER_QUOTES.get(type(connection).__module__.split('.')[0], '"')
+
+def split_byte_ranges(path, parts):
+    """Split a file into at most parts byte ranges that start on line boundaries"""
+    size = os.path.getsize(path)
+    bounds = [0]
+    
+    with open(path, 'rb') as f:
+        for i in range(1, parts):
+            # Move each cut forward to the start of the next line
+            f.seek(size * i // parts)
+            f.readline()
+            position = f.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def read_byte_range(path, start, end):
+    """Yield the raw lines that start within [start, end) of a file"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if position >= end:
+                break
+            if position == 0 and line.startswith(UTF8_BOM):
+                yield line[len(UTF8_BOM):]
+            else:
+                yield line
+            position += len(line)
+
+def read_mapped_range(path, start, end):
+    """Yield the raw lines that start within [start, end) of a file, read through a memory map"""
+    if os.path.getsize(path) == 0:
+        return
+    
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        mapped.seek(start)
+        position = start
+        while position < end:
+            line = mapped.readline()
+            if not line:
+                break
+            if position == 0 and line.startswith(UTF8_BOM):
+                yield line[len(UTF8_BOM):]
+            else:
+                yield line
+            position += len(line)
+
+def detect_input_format(path):
+    """Return 'gzip', 'bz2' or 'zstd' from the magic bytes of a file, or 'file' for plain NDJSON"""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    for magic, compression in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return 'file'
+
+def open_compressed(path, compression):
+    """Open a decompressing binary stream over a gzip, bz2 or zstd file with a large read buffer"""
+    if compression == 'gzip':
+        stream = gzip.open(path, 'rb')
+    elif compression == 'bz2':
+        stream = bz2.open(path, 'rb')
+    elif zstandard is None:
+        raise ImportError("zstd input requires zstandard")
+    else:
+        stream = zstandard.ZstdDecompressor().stream_reader(
+            open(path, 'rb'), read_size=READ_BUFFER_SIZE, read_across_frames=True, closefd=True
+        )
+    return io.BufferedReader(stream, READ_BUFFER_SIZE)
+
+def strip_bom(lines):
+    """Yield lines with the UTF-8 byte order mark removed from the first one"""
+    for line_number, line in enumerate(lines):
+        if line_number == 0 and line.startswith(UTF8_BOM):
+            line = line[len(UTF8_BOM):]
+        yield line
+
+def convert_shard(input_file, shard_dir, start, end, decoder='json', resource_mappings=None, select=None, reader='auto',
+                  typed_schema=True):
+    """Convert one byte range of an NDJSON file into its own table files (process pool worker)"""
+    converter = FHIRToQuotedPipeDelimitedNoHeader(
+        input_file, shard_dir, streaming=True, decoder=decoder, resource_mappings=resource_mappings, select=select,
+        typed_schema=typed_schema
+    )
+    
+    invalid_lines = []
+    read_range = read_mapped_range if reader == 'mmap' else read_byte_range
+    lines = converter.process_lines(
+        read_range(input_file, start, end),
+        lambda line_number, error: invalid_lines.append((line_number, str(error)))
+    )
+    converter.flush_rows()
+    converter.close_writers()
+    
+    return {
+        'output_dir': shard_dir,
+        'lines': lines,
+        'invalid_lines': invalid_lines,
+        'counter': converter.counter,
+        'rows_written': converter.rows_written,
+        'column_stats': converter.column_stats,
+        'unique_ids': converter.unique_ids,
+        'referenced_ids': converter.referenced_ids
+    }
+
+def prefetch_chunks(lines, chunk_size, depth):
+    """Yield lists of lines of about chunk_size bytes, read up to depth chunks ahead on a thread"""
+    lines = iter(lines)
+    
+    def read_chunk():
+        chunk = []
+        size = 0
+        for line in lines:
+            chunk.append(line)
+            size += len(line)
+            if size >= chunk_size:
+                break
+        return chunk
+    
+    # One reader thread runs the reads in order; each one taken is replaced by the next
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        pending = deque(reader.submit(read_chunk) for _ in range(depth))
+        while pending:
+            chunk = pending.popleft().result()
+            if not chunk:
+                break
+            pending.append(reader.submit(read_chunk))
+            yield chunk
+
+# Converter of a pipeline worker process, created once by start_pipeline_worker
+pipeline_converter = None
+
+def start_pipeline_worker(input_file, output_dir, decoder, resource_mappings, select):
+    """Create the converter that flattens the chunks sent to this worker process (pool initializer)"""
+    global pipeline_converter
+    pipeline_converter = FHIRToQuotedPipeDelimitedNoHeader(
+        input_file, output_dir, decoder=decoder, resource_mappings=resource_mappings, select=select
+    )
+
+def convert_chunk(lines):
+    """Flatten a chunk of NDJSON lines into rows numbered from 1 (pipeline worker)"""
+    converter = pipeline_converter
+    converter.data = {table: [] for table in converter.tables}
+    converter.counter = {table: 1 for table in converter.tables}
+    
+    invalid_lines = []
+    count = converter.process_lines(lines, lambda line_number, error: invalid_lines.append((line_number, str(error))))
+    
+    return {
+        'data': converter.data,
+        'counter': converter.counter,
+        'invalid_lines': invalid_lines,
+        'lines': count
+    }
+
+def measure_output_dir(input_file, output_root='.'):
+    """Return the output directory for a measure file, e.g. ..._AMR for 81779-amr_supporting_evidence.ndjson"""
+    name = os.path.basename(input_file).split('_')[0]
+    measure = name.split('-', 1)[-1].upper()
+    return os.path.join(output_root, f"fhir_relational_quoted_pipe_no_header_{measure}")
+
+def convert_file(input_file, output_dir, sqlite=False, parquet=False, **options):
+    """Run the full conversion of one NDJSON file and return its statistics"""
+    start = time.perf_counter()
+    
+    # Stream rows to disk in batches so memory stays flat on large extracts
+    output_format = 'parquet' if parquet else 'csv'
+    converter = FHIRToQuotedPipeDelimitedNoHeader(input_file, output_dir, streaming=True, output_format=output_format, **options)
+    
+    if parquet:
+        converter.process_file()
+        converter.export_to_parquet()
+    elif sqlite:
+        # Load straight into a fresh SQLite database instead of writing table files
+        database_path = os.path.join(output_dir, 'fhir_relational.sqlite')
+        if os.path.exists(database_path):
+            os.remove(database_path)
+        converter.database = sqlite3.connect(database_path)
+        converter.process_file()
+        converter.export_to_database()
+        converter.database.close()
+    else:
+        converter.process_file()
+        converter.export_to_quoted_pipe_delimited_no_header()
     
-    converter = FHIRToQuotedPipeDelimitedNoHeader(input_file, output_dir)
-    converter.process_file()
-    converter.export_to_quoted_pipe_delimited_no_header()
     converter.generate_schema_sql()
     converter.generate_microsoft_access_sql()
     converter.generate_field_maps()
     
+    return {
+        'input_file': input_file,
+        'output_dir': output_dir,
+        'bytes': os.path.getsize(input_file),
+        'rows': {table: converter.row_count(table) for table in converter.tables},
+        'seconds': time.perf_counter() - start,
+        'telemetry': converter.report_telemetry()
+    }
+
+def convert_file_quietly(input_file, output_dir, **options):
+    """Run convert_file in a pool worker, returning its console output with the statistics"""
+    log = io.StringIO()
+    with redirect_stdout(log):
+        stats = convert_file(input_file, output_dir, **options)
+    stats['log'] = log.getvalue()
+    return stats
+
+def print_table_statistics(rows):
+    """Print the row count of every non-empty table"""
+    print("\nTable statistics:")
+    for table, count in rows.items():
+        if count:  # Only show non-empty tables
+            print(f"- {table}: {count} rows")
+
+def convert_batch(input_files, output_root, jobs, **options):
+    """Convert many measure files concurrently, one output directory per measure"""
+    start = time.perf_counter()
+    results = []
+    
+    # Files of the same measure, e.g. from daily folders, would overwrite each other's tables
+    inputs_by_output_dir = {}
+    for input_file in input_files:
+        inputs_by_output_dir.setdefault(measure_output_dir(input_file, output_root), []).append(input_file)
+    clashes = [
+        f"{output_dir} <- {', '.join(files)}" for output_dir, files in inputs_by_output_dir.items() if len(files) > 1
+    ]
+    if clashes:
+        raise ValueError(
+            "Input files of the same measure would share an output directory, convert them separately with "
+            f"-o: {'; '.join(clashes)}"
+        )
+    
+    with ProcessPoolExecutor(max_workers=max(1, min(jobs, len(input_files)))) as pool:
+        futures = [
+            pool.submit(convert_file_quietly, files[0], output_dir, **options)
+            for output_dir, files in inputs_by_output_dir.items()
+        ]
+        for future in as_completed(futures):
+            stats = future.result()
+            results.append(stats)
+            
+            print(f"\n=== {stats['input_file']} -> {stats['output_dir']} ===")
+            print(stats['log'], end='')
+            print_table_statistics(stats['rows'])
+    
+    # Aggregate throughput over the whole batch
+    elapsed = time.perf_counter() - start
+    total_mb = sum(stats['bytes'] for stats in results) / (1024 * 1024)
+    total_rows = sum(sum(stats['rows'].values()) for stats in results)
+    
+    print(f"\nConverted {len(results)} files ({total_mb:.1f} MB, {total_rows} rows) in {elapsed:.2f}s")
+    print(f"Throughput: {total_mb / elapsed:.2f} MB/s, {total_rows / elapsed:.0f} rows/s")
+    return results
+
+def expand_inputs(patterns):
+    """Expand file names and glob patterns into a sorted list of unique files"""
+    input_files = set()
+    for pattern in patterns:
+        matches = glob.glob(pattern)
+        if not matches:
+            raise FileNotFoundError(f"No input files match {pattern}")
+        input_files.update(matches)
+    return sorted(input_files)
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert FHIR supporting evidence NDJSON to quoted pipe-delimited files without headers')
+    parser.add_argument('inputs', nargs='*', help='NDJSON files or glob patterns (default: 81779-amr_supporting_evidence.ndjson)')
+    parser.add_argument('-o', '--output-dir', help='output directory for a single file, or the parent of the per-measure directories')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='files converted concurrently in batch mode')
+    parser.add_argument('--workers', type=int, default=1, help='shard processes per file')
+    parser.add_argument('--decoder', choices=['json', 'bytes', 'orjson'], default='json', help='JSON decoder backend')
+    parser.add_argument('--batch-size', type=int, default=10000, help='rows buffered before they are flushed to disk')
+    parser.add_argument('--reader', choices=INPUT_READERS, default='auto',
+                        help='input reader; auto reads gzip, bz2 and zstd files by their magic bytes')
+    parser.add_argument('--export-threads', type=int, default=1, help='threads writing table files concurrently')
+    parser.add_argument('--compress', choices=['gzip', 'zstd'], help='write compressed .csv.gz or .csv.zst table files')
+    parser.add_argument('--part-rows', type=int, metavar='ROWS',
+                        help='split table files into part files of at most ROWS rows, e.g. eob_adjudications.part-0001.csv')
+    parser.add_argument('--patient-index', metavar='PATH',
+                        help='SQLite patient index kept across runs; only new or changed patients get patient rows')
+    parser.add_argument('--patient-key', choices=PATIENT_KEYS, default='id',
+                        help='key of the patient index; original-id matches a member across measure files')
+    parser.add_argument('--normalize-codes', action='store_true',
+                        help='write code_systems and codes lookup tables and integer code IDs instead of code and system columns')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='overlap reading, flattening (on --workers processes) and writing in bounded stages')
+    parser.add_argument('--pipeline-depth', type=int, default=8, help='chunks or batches each pipeline stage holds')
+    parser.add_argument('--record-cache', metavar='PATH',
+                        help='SQLite cache of the rows flattened from each line, so unchanged lines are reused on re-runs')
+    parser.add_argument('--record-cache-size', type=int, default=1024, metavar='MB',
+                        help='size the record cache is trimmed to, dropping the least recently used lines')
+    parser.add_argument('--untyped-schema', action='store_true',
+                        help='declare TEXT columns in the schemas instead of types inferred from the converted rows')
+    parser.add_argument('--resume', action='store_true', help='record checkpoints and resume or append to the existing output directory')
+    parser.add_argument('--select', action='append', metavar='TABLE[.COLUMN],...',
+                        help='only produce these tables or columns, e.g. --select patients,parameter_values (repeatable)')
+    parser.add_argument('--stats', action='store_true', help='log the time per phase and resource type and the rows per table')
+    parser.add_argument('--progress', type=float, metavar='SECONDS', help='log progress, throughput and ETA at this interval')
+    parser.add_argument('--profile', metavar='PATH', help='save a cProfile of the conversion to PATH and log its top functions')
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--sqlite', action='store_true', help='load fhir_relational.sqlite in the output directory instead of writing table files')
+    output.add_argument('--parquet', action='store_true', help='write typed Parquet files instead of quoted pipe-delimited files')
+    args = parser.parse_args()
+    
+    options = {
+        'workers': args.workers,
+        'decoder': args.decoder,
+        'batch_size': args.batch_size,
+        'reader': args.reader,
+        'export_threads': args.export_threads,
+        'compression': args.compress,
+        'part_rows': args.part_rows,
+        'patient_index': args.patient_index,
+        'patient_key': args.patient_key,
+        'normalize_codes': args.normalize_codes,
+        'pipeline': args.pipeline,
+        'pipeline_depth': args.pipeline_depth,
+        'typed_schema': not args.untyped_schema,
+        'record_cache': args.record_cache,
+        'record_cache_size': args.record_cache_size * 1024 * 1024,
+        'sqlite': args.sqlite,
+        'parquet': args.parquet,
+        'checkpoint': args.resume,
+        'select': [item for items in args.select for item in items.split(',')] if args.select else None,
+        'instrument': args.stats,
+        'progress_interval': args.progress,
+        'profile_path': args.profile
+    }
+    
+    if args.stats or args.progress is not None or args.profile:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    
+    input_files = expand_inputs(args.inputs) if args.inputs else ['81779-amr_supporting_evidence.ndjson']
+    
+    # Several files, or a file without an explicit output directory, get one directory per measure
+    if len(input_files) > 1 or (args.inputs and not args.output_dir):
+        convert_batch(input_files, args.output_dir or '.', args.jobs, **options)
+        return
+    
+    input_file = input_files[0]
+    output_dir = args.output_dir or 'fhir_relational_quoted_pipe_no_header'
+    
+    stats = convert_file(input_file, output_dir, **options)
+    
     print(f"\nConversion completed successfully!")
-    print(f"Quoted pipe-delimited CSV files without headers created in: {output_dir}")
+    if args.sqlite:
+        print(f"SQLite database created at: {os.path.join(output_dir, 'fhir_relational.sqlite')}")
+    elif args.parquet:
+        print(f"Parquet files created in: {output_dir}")
+    else:
+        print(f"Quoted pipe-delimited CSV files without headers created in: {output_dir}")
     print(f"SQL schemas and field maps are included for reference.")
     
     # Print table statistics
-    print("\nTable statistics:")
-    for table, data in converter.data.items():
-        if data:  # Only show non-empty tables
-            print(f"- {table}: {len(data)} rows")
+    print_table_statistics(stats['rows'])
     
     print("\nNOTE: Since header rows were omitted, field maps have been generated")
     print("in the 'field_maps' subdirectory to help identify column positions.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()